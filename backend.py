@@ -1,27 +1,37 @@
 ﻿# -*- coding: utf-8 -*-
 
+import itertools
 import os
 import sys
-from typing import Callable, List, Optional, Dict, Union, Tuple, Any, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Dict, Set, Union, Tuple, Any, Type
 
 import numpy as np
 import pandas as pd
-from PyQt5.QtCore import QCoreApplication, QSettings, QSize, Qt
-from PyQt5.QtGui import QGuiApplication, QIcon, QPixmap
+from PyQt5.QtCore import QCoreApplication, QSettings, QSize, QStandardPaths, Qt, QTimer
+from PyQt5.QtGui import QGuiApplication, QIcon, QPixmap, QScreen
 from PyQt5.QtWidgets import QAction, QDialog, QDoubleSpinBox, QFileDialog, QFormLayout, QGroupBox, QHBoxLayout, \
-    QLabel, QMessageBox, QPushButton, QSizePolicy, QVBoxLayout, QWidget
-from matplotlib import cbook
+    QLabel, QMessageBox, QProgressBar, QPushButton, QSizePolicy, QStyle, QVBoxLayout, QWidget
 from matplotlib.artist import Artist
 from matplotlib.axes import Axes
+from matplotlib.collections import PathCollection
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT
 from matplotlib.figure import Figure
 from matplotlib.legend import Legend
 from matplotlib.lines import Line2D
 from matplotlib.transforms import Bbox
 
+import decimation
 import detection
 import figureoptions
 import mplcursors
+import sweep_cache
+import workers
+from lines_index import LinesIndex
+from marked_points import MarkedPoints
+from range_stats import RangeStats
+from uniform_axis import UniformAxis
+from view_state import ViewState
 from mplcursors import Selection
 
 FRAME_SIZE: float = 50.
@@ -185,9 +195,21 @@ class NavigationToolbar(NavigationToolbar2QT):
         NavigationToolbar2QT.__init__(self, canvas, parent, coordinates)
         self.parameters_title = parameters_title
         self.parameters_icon = parameters_icon
+        # the text about the data under the mouse pointer to show after the coordinates, by the mouse event
+        self.cursor_data_text: Optional[Callable[[Any], Optional[str]]] = None
+
+        # the coordinates are shown at most once per screen refresh, for the latest mouse position
+        self._mouse_event = None
+        self._mouse_move_timer: QTimer = QTimer(self)
+        self._mouse_move_timer.setSingleShot(True)
+        screen: Optional[QScreen] = QGuiApplication.primaryScreen()
+        refresh_rate: float = screen.refreshRate() if screen is not None else 0.
+        self._mouse_move_timer.setInterval(round(1000. / (refresh_rate or 60.)))
+        self._mouse_move_timer.timeout.connect(self._show_coordinates)
 
         self.open_action = QAction(self)
         self.clear_action = QAction(self)
+        self.cancel_action = QAction(self)
         self.zoom_action = QAction(self)
         self.pan_action = QAction(self)
         self.mark_action = QAction(self)
@@ -226,9 +248,16 @@ class NavigationToolbar(NavigationToolbar2QT):
                          'copySelected', 'saveSelected', 'clearSelected',
                          'size', 'configure']):
             a.setIcon(load_icon(i.lower()))
+        self.cancel_action.setIcon(self.style().standardIcon(QStyle.SP_DialogCancelButton))
+
+        self.progress_bar: QProgressBar = QProgressBar(self)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setMaximumWidth(100)
 
         self.addAction(self.open_action)
         self.addAction(self.clear_action)
+        self.progress_action: QAction = self.addWidget(self.progress_bar)
+        self.addAction(self.cancel_action)
         self.addSeparator()
         self.addAction(self.pan_action)
         self.addAction(self.zoom_action)
@@ -260,6 +289,9 @@ class NavigationToolbar(NavigationToolbar2QT):
         self.clear_trace_action.setEnabled(False)
         self.configure_action.setEnabled(False)
 
+        self.progress_action.setVisible(False)
+        self.cancel_action.setVisible(False)
+
         self.zoom_action.setCheckable(True)
         self.pan_action.setCheckable(True)
         self.mark_action.setCheckable(True)
@@ -315,35 +347,24 @@ class NavigationToolbar(NavigationToolbar2QT):
         set_cursor = getattr(self, '_update_cursor' if hasattr(self, '_update_cursor') else '_set_cursor')
         set_cursor(event)
 
-        if event.inaxes and event.inaxes.get_navigate():
+        self._mouse_event = event
+        if not self._mouse_move_timer.isActive():
+            self._mouse_move_timer.start()
+
+    def _show_coordinates(self):
+        event = self._mouse_event
+        self._mouse_event = None
+        if event is not None and event.inaxes and event.inaxes.get_navigate():
             try:
                 s: str = event.inaxes.format_coord(event.xdata, event.ydata)
             except (ValueError, OverflowError):
                 pass
             else:
-                if hasattr(event.inaxes, '_mouseover_set'):
-                    mouseover_set = getattr(event.inaxes, '_mouseover_set')
-                elif hasattr(event.inaxes, 'mouseover_set'):
-                    mouseover_set = getattr(event.inaxes, 'mouseover_set')
-                else:
-                    return
-                artists = [a for a in mouseover_set
-                           if a.contains(event)[0] and a.get_visible()]
-
-                if artists:
-                    if hasattr(cbook, '_topmost_artist'):
-                        topmost_artist = getattr(cbook, '_topmost_artist')
-                    elif hasattr(cbook, 'topmost_artist'):
-                        topmost_artist = getattr(cbook, 'topmost_artist')
-                    else:
-                        return
-                    a: Artist = topmost_artist(artists)
-                    if a is not event.inaxes.patch:
-                        data = a.get_cursor_data(event)
-                        if data is not None:
-                            data_str = a.format_cursor_data(data)
-                            if data_str is not None:
-                                s += ' ' + data_str
+                # not testing every artist for containing the pointer, for that is O(N) for a line
+                if self.cursor_data_text is not None:
+                    data_str: Optional[str] = self.cursor_data_text(event)
+                    if data_str is not None:
+                        s += ' ' + data_str
                 self.set_message(s)
 
 
@@ -357,14 +378,24 @@ class Plot:
     _plot_lines: List[Line2D]
     _plot_mark_lines: List[Line2D]
     _plot_lines_labels: List[str]
-    _plot_frequencies: List[np.ndarray]
+    _plot_frequencies: List[UniformAxis]
     _plot_voltages: List[np.ndarray]
+    _plot_pyramids: List[decimation.MinMaxPyramid]
+    _plot_stats: List[RangeStats]
+    _plot_file_ids: List[Optional[sweep_cache.FileId]]
+    _plot_detectors: List[Optional[detection.LineDetector]]
+    _plot_envelopes: List[Tuple[np.ndarray, np.ndarray]]
+    _sweep_cache: sweep_cache.SweepCache
+    _sweep_loader: Optional[workers.SweepLoader]
+    _cancelled_sweep_loaders: List[workers.SweepLoader]
+    _lines_finder: Optional[workers.LinesFinder]
+    _lines_pool: Optional[ThreadPoolExecutor]
+    _lines_index: LinesIndex
     _min_frequency: Optional[float]
     _max_frequency: Optional[float]
     _min_voltage: Optional[float]
     _max_voltage: Optional[float]
-    _min_mark: Optional[float]
-    _max_mark: Optional[float]
+    _view: ViewState
     _ignore_scale_change: bool
     _ax_v_lines: List[Line2D]
     on_xlim_changed_callback: Optional[Callable]
@@ -397,6 +428,7 @@ class Plot:
 
         self._toolbar.open_action.triggered.connect(self.load_data)
         self._toolbar.clear_action.triggered.connect(self.clear)
+        self._toolbar.cancel_action.triggered.connect(self.cancel)
         self._toolbar.zoom_action.triggered.connect(self._toolbar.zoom)
         self._toolbar.pan_action.triggered.connect(self._toolbar.pan)
         self._toolbar.save_data_action.triggered.connect(
@@ -420,8 +452,26 @@ class Plot:
                                                    animated=False)[0]
                                  for i in range(LINES_COUNT)]
         self._plot_lines_labels = ['_*empty*_'] * LINES_COUNT
-        self._plot_frequencies = [np.empty(0)] * LINES_COUNT
+        self._plot_frequencies = [UniformAxis()] * LINES_COUNT
         self._plot_voltages = [np.empty(0)] * LINES_COUNT
+        self._plot_pyramids = [decimation.MinMaxPyramid(np.empty(0))] * LINES_COUNT
+        self._plot_stats = [RangeStats(np.empty(0))] * LINES_COUNT
+        self._plot_file_ids = [None] * LINES_COUNT
+        self._plot_detectors = [None] * LINES_COUNT
+        self._plot_envelopes = [(np.empty(0), np.empty(0))] * LINES_COUNT
+
+        self._sweep_cache = sweep_cache.SweepCache(
+            os.path.join(QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation),
+                         'SavSoft', 'Fast Sweep Viewer'),
+            size_limit=self.get_config_value('cache', 'sizeLimit', sweep_cache.SIZE_LIMIT, int))
+        self._sweep_loader = None
+        # the loaders stopped, which might still be busy with a step that can't be interrupted
+        self._cancelled_sweep_loaders = []
+        self._lines_finder = None
+        self._lines_pool = None
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(lambda: self.cancel_loading(wait=True))
+            QCoreApplication.instance().aboutToQuit.connect(self.shut_lines_pool_down)
 
         def on_pick(event):
             # on the pick event, find the orig line corresponding to the
@@ -469,22 +519,39 @@ class Plot:
             )
         self.plot_trace_cursor = mplcursors.Cursor(self.lines,
                                                    bindings={'left': 'left', 'right': 'right'},
-                                                   annotation_kwargs=annotation_kwargs)
+                                                   annotation_kwargs=annotation_kwargs,
+                                                   move=self.step_along_trace)
         self.plot_trace_cursor.enabled = False
-        self.plot_trace_multiple_cursor = mplcursors.Cursor(self.lines, multiple=True,
-                                                            bindings={'left': 'left', 'right': 'right'},
-                                                            annotation_kwargs=annotation_kwargs)
+        # only the point marked last gets an annotation; the others are drawn by `_trace_multiple_markers` at once
+        self.plot_trace_multiple_cursor = mplcursors.Cursor(self.lines,
+                                                            bindings={'left': 'left', 'right': 'right',
+                                                                      'deselect': None},
+                                                            annotation_kwargs=annotation_kwargs,
+                                                            move=self.step_along_trace)
         self.plot_trace_multiple_cursor.enabled = False
+        # the points marked with the cursors, filled in when the annotations get their text
+        self._trace_marks: MarkedPoints = MarkedPoints()
+        self._trace_multiple_marks: MarkedPoints = MarkedPoints()
+        # the keys of the marked points are stored in their annotations
+        self._mark_keys: Iterator[int] = itertools.count()
+        self._active_multiple_mark: Optional[int] = None
+        self._trace_multiple_markers: PathCollection = self._figure.scatter(
+            np.empty(0), np.empty(0), marker='o', facecolors='none', edgecolors='k',
+            label='_*marked points*_', animated=False, zorder=3)
+        self._trace_multiple_markers.set_visible(False)
+        self.plot_trace_cursor.connect("remove", lambda sel: self._trace_marks.remove((sel.annotation.mark_key,)))
+        # the points marked with several annotations stay marked when their annotations are replaced
+        self._canvas.mpl_connect('button_press_event', self.on_multiple_mark_deselect)
 
         self._min_frequency = None
         self._max_frequency = None
         self._min_voltage = None
         self._max_voltage = None
-        self._min_mark = None
-        self._max_mark = None
-
         self._ignore_scale_change = False
 
+        self._view = ViewState(self._figure.get_xlim(), self._figure.get_ylim(), parent=self._toolbar)
+        self._view.changed.connect(self.on_view_changed)
+
         self._ax_v_lines = [self._figure.axvline(np.nan, color='grey', linewidth=0.5,
                                                  label='_ vertical line {}'.format(i + 1))
                             for i in range(GRID_LINES_COUNT)]
@@ -494,6 +561,7 @@ class Plot:
         self.on_data_loaded_callback = kwargs.pop('on_data_loaded', None)
 
         self._figure.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self._canvas.mpl_connect('resize_event', lambda event: self._view.invalidate(ViewState.LINES))
         self._figure.callbacks.connect('ylim_changed', self.on_ylim_changed)
 
         self.translate_ui()
@@ -505,6 +573,25 @@ class Plot:
             self.model_signal: np.ndarray = np.loadtxt('averaged fs signal filtered.csv')
         except (OSError, BlockingIOError):
             self.model_signal: np.ndarray = np.empty(0)
+        self._templates: detection.TemplateCache = detection.TemplateCache(self.model_signal)
+        # the widths of the lines to look for relative to the model, a space-separated list
+        widths: List[float]
+        try:
+            widths = [float(width) for width in self.get_config_value('lineSearch', 'templateWidths',
+                                                                      ' '.join(map(str, detection.TEMPLATE_WIDTHS)),
+                                                                      str).split()]
+        except ValueError:
+            widths = []
+        self._template_widths: Tuple[float, ...] = tuple(sorted(set(w for w in widths if w > 0.0))) \
+            or detection.TEMPLATE_WIDTHS
+        self._lines_threshold: Optional[float] = None
+        self._lines_in_view: bool = False
+        # whether the lines found are added to the ones found before rather than replace them
+        self._lines_merging: bool = False
+        # the searches within the previous views, stopped by the ones for the next views,
+        # whose results for the traces being processed then are still merged
+        self._lines_replaced_finders: List[workers.LinesFinder] = []
+        self._lines_index = LinesIndex()
         self.found_lines: List[Line2D] = [self._figure.plot(np.empty(0),
                                                             ls='', marker='o',
                                                             label='_*automatically_found_lines*_ {}'.format(i + 1),
@@ -521,10 +608,21 @@ class Plot:
         self._figure.set_ylabel(_translate("plot axes labels", 'Voltage [mV]'))
         self._figure.format_coord = lambda x, y: ('{:.3f}' + suffix_mv + '\n{:.3f}' + suffix_mhz).format(y, x)
 
+        def cursor_data_text(event) -> Optional[str]:
+            found: Optional[Tuple[int, int]] = self.trace_under_pointer(event)
+            if found is None:
+                return None
+            return ('[{:.3f}' + suffix_mv + ']').format(self._plot_voltages[found[0]][found[1]])
+
+        self._toolbar.cursor_data_text = cursor_data_text
+
         self._toolbar.open_action.setIconText(_translate("plot toolbar action", "Open"))
         self._toolbar.open_action.setToolTip(_translate("plot toolbar action", "Load spectrometer data"))
         self._toolbar.clear_action.setIconText(_translate("plot toolbar action", "Clear"))
-        self._toolbar.clear_action.setToolTip(_translate("plot toolbar action", "Clear lines and markers"))
+        self._update_clear_tool_tip()
+        self._toolbar.cancel_action.setIconText(_translate("plot toolbar action", "Cancel"))
+        self._toolbar.cancel_action.setToolTip(_translate("plot toolbar action",
+                                                          "Stop loading the data or finding lines"))
         self._toolbar.zoom_action.setIconText(_translate("plot toolbar action", "Zoom"))
         self._toolbar.zoom_action.setToolTip(_translate("plot toolbar action",
                                                         "Zoom to rectangle with left mouse, un-zoom with right"))
@@ -558,21 +656,33 @@ class Plot:
             x: np.float64 = sel.target[0]
             y: np.float64 = sel.target[1]
             line: Line2D = sel.artist
-            good: np.ndarray = np.abs(line.get_xdata() - x) < TRACE_AVERAGING_RANGE
-            average_y: Union[np.float64, np.ndarray] = np.mean(line.get_ydata()[good])
+            # the lines hold only the points drawn, so take the trace data
+            average_y: float = self.mean_around(self.lines.index(line) % LINES_COUNT, x)
             setattr(sel.target, 'offset', average_y)
             return (line.original_label + '\n'
                     + '{:.3f}' + suffix_mhz + '\n'
                     + '{:.3f}' + suffix_mv + '\n'
                     + '{:.3f}' + suffix_mv + ' ' + _translate('main window', "to mean")).format(x, y, y - average_y)
 
-        def cursor_add_action(sel: Selection):
+        def cursor_add_action(sel: Selection, marks: MarkedPoints):
             sel.annotation.set_text(annotation_text(sel))
             if hasattr(sel.artist, 'original_label'):
                 setattr(sel.annotation, 'original_label', sel.artist.original_label)
-
-        self.plot_trace_cursor.connect("add", cursor_add_action)
-        self.plot_trace_multiple_cursor.connect("add", cursor_add_action)
+            # an annotation moved along the trace keeps its key, so the point is replaced
+            if not hasattr(sel.annotation, 'mark_key'):
+                setattr(sel.annotation, 'mark_key', next(self._mark_keys))
+            marks.add((sel.annotation.mark_key,), (sel.target[0],), (sel.target[1],), (sel.target.offset,),
+                      (getattr(sel.annotation, 'original_label', sel.artist.get_label()),))
+
+        def cursor_multiple_add_action(sel: Selection):
+            cursor_add_action(sel, self._trace_multiple_marks)
+            if sel.annotation.mark_key != self._active_multiple_mark:
+                # the point annotated before is drawn as a marker now
+                self._active_multiple_mark = sel.annotation.mark_key
+                self.update_multiple_markers()
+
+        self.plot_trace_cursor.connect("add", lambda sel: cursor_add_action(sel, self._trace_marks))
+        self.plot_trace_multiple_cursor.connect("add", cursor_multiple_add_action)
 
     def make_grid(self, xlim):
         if any(map(lambda lim: lim is None, xlim)):
@@ -594,21 +704,35 @@ class Plot:
     def on_xlim_changed(self, axes):
         if self._ignore_scale_change:
             return
-        xlim: Tuple[float, float] = axes.get_xlim()
-        self.make_grid(xlim)
-        if self.on_xlim_changed_callback is not None and callable(self.on_xlim_changed_callback):
-            self._ignore_scale_change = True
-            self.on_xlim_changed_callback(xlim)
-            self._ignore_scale_change = False
+        self._view.set_xlim(*axes.get_xlim())
 
     def on_ylim_changed(self, axes):
         if self._ignore_scale_change:
             return
-        ylim: Tuple[float, float] = axes.get_ylim()
-        if self.on_ylim_changed_callback is not None and callable(self.on_ylim_changed_callback):
-            self._ignore_scale_change = True
-            self.on_ylim_changed_callback(ylim)
-            self._ignore_scale_change = False
+        self._view.set_ylim(*axes.get_ylim())
+
+    def on_view_changed(self, changes: int):
+        """ bring the axes and the lines in line with the view state, then draw them once """
+        self._ignore_scale_change = True
+        if changes & ViewState.XLIM:
+            self._figure.set_xlim(*self._view.xlim)
+            self.make_grid(self._figure.get_xlim())
+        if changes & ViewState.YLIM:
+            self._figure.set_ylim(*self._view.ylim)
+        self._ignore_scale_change = False
+        if changes & (ViewState.XLIM | ViewState.LINES):
+            self.update_lines(self._view.marks)
+        elif changes & ViewState.MARKS:
+            self.update_marks(self._view.marks)
+        self._canvas.draw_idle()
+        if changes & (ViewState.XLIM | ViewState.MARKS) and self._lines_in_view and self.lines_found:
+            self.find_lines(self._lines_threshold, in_view=True)
+        if changes & ViewState.XLIM \
+                and self.on_xlim_changed_callback is not None and callable(self.on_xlim_changed_callback):
+            self.on_xlim_changed_callback(self._figure.get_xlim())
+        if changes & ViewState.YLIM \
+                and self.on_ylim_changed_callback is not None and callable(self.on_ylim_changed_callback):
+            self.on_ylim_changed_callback(self._figure.get_ylim())
 
     def load_settings(self):
         attrs: List[str] = ['top', 'bottom', 'left', 'right']
@@ -621,6 +745,85 @@ class Plot:
     def lines(self):
         return self._plot_lines + self._plot_mark_lines
 
+    def mean_around(self, index: int, frequency: float) -> float:
+        """ the mean voltage of a trace within `TRACE_AVERAGING_RANGE` of the frequency """
+        frequencies: UniformAxis = self._plot_frequencies[index]
+        return self._plot_stats[index].mean(frequencies.searchsorted(frequency - TRACE_AVERAGING_RANGE, side='right'),
+                                            frequencies.searchsorted(frequency + TRACE_AVERAGING_RANGE, side='left'))
+
+    def _pick_square(self, event) -> Tuple[float, float, float, float]:
+        """ the data limits of the square within the pick radius around the mouse pointer: x, x, y, y, ascending """
+        # the pick radius is in points, as `Line2D.contains` has it
+        radius: float = self._plot_lines[0].pickradius * self._canvas.figure.dpi / 72.
+        corners: np.ndarray = self._figure.transData.inverted().transform([(event.x - radius, event.y - radius),
+                                                                           (event.x + radius, event.y + radius)])
+        x_lower: float
+        x_upper: float
+        y_lower: float
+        y_upper: float
+        x_lower, x_upper = sorted(corners[:, 0])
+        y_lower, y_upper = sorted(corners[:, 1])
+        return x_lower, x_upper, y_lower, y_upper
+
+    def trace_under_pointer(self, event) -> Optional[Tuple[int, int]]:
+        """
+        Find the trace drawn under the mouse pointer in O(log N), without testing the points drawn.
+
+        :param event: the mouse event
+        :return: the index of the topmost trace within the pick radius of the pointer
+            and the index of its point nearest to the pointer frequency, or `None` if there is no trace there
+        """
+        if event.inaxes is not self._figure or event.xdata is None:
+            return None
+        x_lower: float
+        x_upper: float
+        y_lower: float
+        y_upper: float
+        x_lower, x_upper, y_lower, y_upper = self._pick_square(event)
+        i: int
+        for i in reversed(range(LINES_COUNT)):  # the lines of the later traces are drawn over the earlier ones
+            x: UniformAxis = self._plot_frequencies[i]
+            if not x.size or not (self._plot_lines[i].get_visible() or self._plot_mark_lines[i].get_visible()):
+                continue
+            lower: int
+            upper: int
+            lower, upper = x.index_range(x_lower, x_upper)
+            # the points around the pick square, as the line between them might cross it
+            lower, upper = max(lower - 1, 0), min(upper + 1, x.size)
+            min_voltage: float
+            max_voltage: float
+            min_voltage, max_voltage = self._plot_pyramids[i].range_min_max(lower, upper)
+            if min_voltage <= y_upper and max_voltage >= y_lower:
+                return i, x.nearest(event.xdata)
+        return None
+
+    def step_along_trace(self, sel: Selection, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        Find the point of the trace next to the one selected, skipping the points missing.
+
+        The lines hold only the points drawn, and they get new data as the view changes,
+        so the point selected is found anew in the trace data by its frequency.
+
+        :param sel: the selection to move
+        :param key: `'left'` for the previous point, `'right'` for the next one
+        :return: the frequency and the voltage of the point, and its index in the trace,
+            or `None` if there is no point that way
+        """
+        step: int = {'left': -1, 'right': 1}.get(key, 0)
+        if not step or sel.artist not in self.lines:
+            return None
+        index: int = self.lines.index(sel.artist) % LINES_COUNT
+        x: UniformAxis = self._plot_frequencies[index]
+        y: np.ndarray = self._plot_voltages[index]
+        if not x.size:
+            return None
+        point: int = x.nearest(sel.target[0]) + step
+        while 0 <= point < y.size and np.isnan(y[point]):
+            point += step
+        if not 0 <= point < y.size:
+            return None
+        return np.array([x[point], y[point]]), point
+
     @property
     def marked_lines(self):
         return self._plot_mark_lines
@@ -633,135 +836,319 @@ class Plot:
         event.inaxes.set_autoscaley_on(True)
         event.inaxes.relim(visible_only=True)
         event.inaxes.autoscale_view(None, None, None)
-        event.inaxes.set_xlim(self._min_frequency, self._max_frequency)
-        event.inaxes.set_ylim(self._min_voltage, self._max_voltage)
-        self._canvas.draw_idle()
+        self._view.set_xlim(self._min_frequency, self._max_frequency)
+        self._view.set_ylim(self._min_voltage, self._max_voltage)
         return self._min_frequency, self._max_frequency, self._min_voltage, self._max_voltage
 
     def set_frequency_range(self, lower_value=None, upper_value=None):
-        self._figure.set_xlim(left=lower_value, right=upper_value, emit=True)
-        self._canvas.draw_idle()
+        self._view.set_xlim(lower_value, upper_value)
 
     def set_voltage_range(self, lower_value=None, upper_value=None):
-        self._figure.set_ylim(bottom=lower_value, top=upper_value, emit=False)
-        self._canvas.draw_idle()
+        self._view.set_ylim(lower_value, upper_value)
 
     def set_mark(self, lower_value=None, upper_value=None):
-        self._min_mark = lower_value
-        self._max_mark = upper_value
-        self.draw_data((lower_value, upper_value))
+        self._view.set_marks(lower_value, upper_value)
 
-    def draw_data(self, marks):
-        self._ignore_scale_change = True
+    def draw_data(self):
         i: int
-        x: np.ndarray
+        x: UniformAxis
         y: np.ndarray
         for i, (x, y) in enumerate(zip(self._plot_frequencies, self._plot_voltages)):
-            left_x: np.ndarray = np.empty(0)
-            left_y: np.ndarray = np.empty(0)
-            middle_x: np.ndarray = x
-            middle_y: np.ndarray = y
-            right_x: np.ndarray = np.empty(0)
-            right_y: np.ndarray = np.empty(0)
-            if marks[0] is not None:
-                good: np.ndarray = (middle_x < marks[0])
-                left_x = middle_x[good]
-                left_y = middle_y[good]
-                middle_x = middle_x[~good]
-                middle_y = middle_y[~good]
-                del good
-            if marks[1] is not None:
-                good: np.ndarray = (middle_x > marks[1])
-                right_x = middle_x[good]
-                right_y = middle_y[good]
-                middle_x = middle_x[~good]
-                middle_y = middle_y[~good]
-                del good
-            side_x: np.ndarray = np.concatenate((left_x, [np.nan], right_x))
-            side_y: np.ndarray = np.concatenate((left_y, [np.nan], right_y))
             if self._plot_lines[i].get_xdata().size == 0:
-                self._figure.set_xlim(self._min_frequency, self._max_frequency)
-                self._figure.set_ylim(self._min_voltage, self._max_voltage)
-            self._plot_lines[i].set_data(side_x, side_y)
+                self._view.set_xlim(self._min_frequency, self._max_frequency)
+                self._view.set_ylim(self._min_voltage, self._max_voltage)
             self._plot_lines[i].set_label(self._plot_lines_labels[i] + ' (not marked)')
             setattr(self._plot_lines[i], 'original_label', self._plot_lines_labels[i])
-            self._plot_mark_lines[i].set_data(middle_x, middle_y)
             self._plot_mark_lines[i].set_label(self._plot_lines_labels[i] + ' (marked)')
             setattr(self._plot_mark_lines[i], 'original_label', self._plot_lines_labels[i])
-        self._canvas.draw_idle()
-        self._ignore_scale_change = False
-
-    def find_lines(self, threshold: float):
+        self._view.invalidate(ViewState.LINES)
+
+    def update_lines(self, marks):
+        """ put the points of the traces worth drawing within the current view into the lines """
+        xlim: Tuple[float, float] = self._figure.get_xlim()
+        columns_count: int = max(1, round(self._figure.bbox.width))
+        envelopes: List[Tuple[np.ndarray, np.ndarray]] = []
+        x: UniformAxis
+        pyramid: decimation.MinMaxPyramid
+        for x, pyramid in zip(self._plot_frequencies, self._plot_pyramids):
+            visible_lower: int
+            visible_upper: int
+            visible_lower, visible_upper = x.index_range(min(xlim), max(xlim))
+            block_size: int = (visible_upper - visible_lower) // columns_count
+            # take a column more at each side for the lines to reach the axes edges
+            visible_lower = max(0, visible_lower - max(1, block_size))
+            visible_upper = min(x.size, visible_upper + max(1, block_size))
+            if visible_lower >= visible_upper:
+                envelopes.append((np.empty(0), np.empty(0)))
+                continue
+            indices: np.ndarray
+            values: np.ndarray
+            indices, values = pyramid.envelope(visible_lower, visible_upper, block_size)
+            envelopes.append((x[indices], values))
+        self._plot_envelopes = envelopes
+        self.update_marks(marks)
+
+    def update_marks(self, marks):
+        """ split the points taken by `update_lines` into the marked and the not marked ones """
+        i: int
+        x: np.ndarray
+        y: np.ndarray
+        for i, (x, y) in enumerate(self._plot_envelopes):
+            mark_lower: int = 0 if marks[0] is None else np.searchsorted(x, marks[0], side='left')
+            mark_upper: int = x.size if marks[1] is None else np.searchsorted(x, marks[1], side='right')
+            mark_upper = max(mark_lower, mark_upper)
+            self._plot_lines[i].set_data(np.concatenate((x[:mark_lower], [np.nan], x[mark_upper:])),
+                                         np.concatenate((y[:mark_lower], [np.nan], y[mark_upper:])))
+            self._plot_mark_lines[i].set_data(x[mark_lower:mark_upper], y[mark_lower:mark_upper])
+
+    def find_lines(self, threshold: float, in_view: bool = False):
+        """
+        Start finding lines in all the traces in the background, stopping the search already running.
+
+        With `in_view`, the lines are looked for only within the visible part of the marked range,
+        and they are looked for again when that range changes. The lines found before with the same threshold
+        are kept then, so the lines found pile up as the view moves. So are the lines found in the traces
+        that the search within the previous view has been processing when this search stopped it.
+        """
         if self.model_signal.size < 2:
             return
 
-        from scipy import interpolate
-
-        self._ignore_scale_change = True
+        replaced_finder: Optional[workers.LinesFinder] = self._lines_finder
+        self.cancel_finding_lines()
+        self._lines_merging = in_view and self._lines_in_view and threshold == self._lines_threshold
+        if not self._lines_merging:
+            self._lines_replaced_finders.clear()
+        elif replaced_finder is not None:
+            self._lines_replaced_finders.append(replaced_finder)
+        self._lines_threshold = threshold
+        self._lines_in_view = in_view
+        lower: float = nonemax((self._view.xlim[0], self._view.marks[0]))
+        upper: float = nonemin((self._view.xlim[1], self._view.marks[1]))
+        detectors: Dict[int, detection.LineDetector] = dict()
+        regions: Dict[int, Tuple[int, int]] = dict()
         for i, (x, y) in enumerate(zip(self._plot_frequencies, self._plot_voltages)):
             if x.size < 2 or y.size < 2:
                 continue
-            # re-scale the signal to the actual frequency mesh
-            x_model: np.ndarray = np.arange(self.model_signal.size, dtype=x.dtype) * 0.1
-            f = interpolate.interp1d(x_model, self.model_signal, kind=2)
-            x_model_new: np.ndarray = np.arange(x_model[0], x_model[-1], x[1] - x[0])
-            y_model_new: np.ndarray = f(x_model_new)
-            found_lines = detection.peaks_positions(x, detection.correlation(y_model_new, x, y),
-                                                    threshold=1.0 / threshold)
-            if found_lines.size:
-                self.found_lines[i].set_data(x[found_lines], y[found_lines])
-            else:
-                self.found_lines[i].set_data(np.empty(0), np.empty(0))
+            if self._plot_detectors[i] is None:
+                self._plot_detectors[i] = detection.LineDetector(
+                    x, y, self._templates.filter_bank(x.step, self._template_widths), parallel=True)
+            detectors[i] = self._plot_detectors[i]
+            if in_view:
+                regions[i] = x.index_range(lower, upper)
+        if not detectors:
+            return
+        if self._lines_pool is None:
+            # kept for all the searches, for one is started on every change of the view
+            self._lines_pool = ThreadPoolExecutor(max_workers=min(LINES_COUNT, os.cpu_count() or 1))
+        finder: workers.LinesFinder = workers.LinesFinder(detectors, 1.0 / threshold, self._lines_pool,
+                                                          regions=regions, parent=self._toolbar)
+        finder.finished.connect(finder.deleteLater)
+        finder.found.connect(lambda index, found_lines: self.on_lines_found(finder, index, found_lines))
+        finder.progress.connect(lambda done, total: self.on_finding_lines_progress(finder, done, total))
+        finder.failed.connect(lambda message: self.on_finding_lines_failed(finder, message))
+        finder.finished.connect(lambda: self.on_finding_lines_finished(finder))
+        self._lines_finder = finder
+        if self._sweep_loader is None:
+            self._toolbar.progress_bar.setRange(0, len(detectors))
+            self._toolbar.progress_bar.setValue(0)
+        self._update_progress_widgets()
+        finder.start()
+
+    def cancel_finding_lines(self, wait: bool = False):
+        """ stop finding lines; the traces being processed are processed to the end in the background """
+        if self._lines_finder is None:
+            return
+        finder: workers.LinesFinder = self._lines_finder
+        self._lines_finder = None
+        finder.requestInterruption()
+        if wait:
+            finder.wait()
+        self._update_progress_widgets()
+
+    def shut_lines_pool_down(self):
+        """ stop finding lines and wait for the threads finding them to end """
+        self.cancel_finding_lines(wait=True)
+        if self._lines_pool is not None:
+            self._lines_pool.shutdown(wait=True)
+            self._lines_pool = None
+
+    def on_lines_found(self, finder: workers.LinesFinder, index: int, found_lines: np.ndarray):
+        if finder.detectors[index] is not self._plot_detectors[index]:
+            return
+        if finder is not self._lines_finder and finder not in self._lines_replaced_finders:
+            return
+        if self._lines_merging or finder is not self._lines_finder:
+            found_lines = np.union1d(self._lines_index.trace_lines(index)[0], found_lines)
+        x: UniformAxis = self._plot_frequencies[index]
+        y: np.ndarray = self._plot_voltages[index]
+        detector: detection.LineDetector = finder.detectors[index]
+        self._lines_index.set_trace(index, found_lines, x[found_lines], y[found_lines],
+                                    detector.correlation[found_lines],
+                                    np.asarray(self._template_widths)[detector.kernels[found_lines]])
+        self.update_found_lines()
         self._canvas.draw_idle()
-        self._ignore_scale_change = False
 
-    def prev_found_line(self, init_frequency: float) -> float:
-        prev_line_freq: np.ndarray = np.full(len(self.found_lines), init_frequency)
+    def update_found_lines(self):
+        """ put the lines found into the markers """
+        index: int
+        line: Line2D
         for index, line in enumerate(self.found_lines):
-            line_data: np.ndarray = line.get_xdata()
-            i: int = np.searchsorted(line_data, init_frequency, side='right') - 2
-            if 0 <= i < line_data.size and line_data[i] != init_frequency:
-                prev_line_freq[index] = line_data[i]
-            else:
-                prev_line_freq[index] = np.nan
-        prev_line_freq = prev_line_freq[~np.isnan(prev_line_freq)]
-        if prev_line_freq.size:
-            return prev_line_freq[np.argmin(init_frequency - prev_line_freq)]
-        else:
-            return init_frequency
+            line.set_data(*self._lines_index.trace_lines(index)[1:])
 
-    def next_found_line(self, init_frequency: float) -> float:
-        next_line_freq: np.ndarray = np.full(len(self.found_lines), init_frequency)
-        for index, line in enumerate(self.found_lines):
-            line_data: np.ndarray = line.get_xdata()
-            i: int = np.searchsorted(line_data, init_frequency, side='left') + 1
-            if i < line_data.size and line_data[i] != init_frequency:
-                next_line_freq[index] = line_data[i]
-            else:
-                next_line_freq[index] = np.nan
-        next_line_freq = next_line_freq[~np.isnan(next_line_freq)]
-        if next_line_freq.size:
-            return next_line_freq[np.argmin(next_line_freq - init_frequency)]
-        else:
-            return init_frequency
+    def on_finding_lines_progress(self, finder: workers.LinesFinder, done: int, total: int):
+        if finder is not self._lines_finder or self._sweep_loader is not None:
+            return
+        self._toolbar.progress_bar.setRange(0, total)
+        self._toolbar.progress_bar.setValue(done)
+
+    def on_finding_lines_failed(self, finder: workers.LinesFinder, message: str):
+        if finder is not self._lines_finder:
+            return
+        QMessageBox.critical(self._canvas.parent(), "Error finding lines", message,
+                             QMessageBox.Ok, QMessageBox.NoButton)
+
+    def on_finding_lines_finished(self, finder: workers.LinesFinder):
+        if finder in self._lines_replaced_finders:
+            self._lines_replaced_finders.remove(finder)
+        if finder is not self._lines_finder:
+            return
+        self._lines_finder = None
+        self._update_progress_widgets()
+
+    def prev_found_line(self, init_frequency: float, tolerance: float = 0.0) -> float:
+        """ the frequency of the closest line found below `init_frequency - tolerance`, `init_frequency` if none """
+        index: Optional[int] = self._lines_index.previous(init_frequency, tolerance)
+        return init_frequency if index is None else float(self._lines_index.frequencies[index])
+
+    def next_found_line(self, init_frequency: float, tolerance: float = 0.0) -> float:
+        """ the frequency of the closest line found above `init_frequency + tolerance`, `init_frequency` if none """
+        index: Optional[int] = self._lines_index.next(init_frequency, tolerance)
+        return init_frequency if index is None else float(self._lines_index.frequencies[index])
+
+    @property
+    def lines_index(self) -> LinesIndex:
+        """ the lines found in all the traces """
+        return self._lines_index
+
+    @property
+    def lines_found(self) -> bool:
+        """ whether `find_lines` has been called since the found lines were cleared """
+        return self._lines_threshold is not None
 
     def clear_lines(self):
-        line: Line2D
-        for line in self.found_lines:
-            line.set_data(np.empty(0), np.empty(0))
+        self.cancel_finding_lines()
+        self._lines_replaced_finders.clear()
+        self._lines_threshold = None
+        self._lines_index.clear()
+        self.update_found_lines()
         self._canvas.draw_idle()
 
-    def clear_selections(self):
-        sel: Selection
-        for sel in self.plot_trace_multiple_cursor.selections:
-            self.plot_trace_multiple_cursor.remove_selection(sel)
-        for sel in self.plot_trace_cursor.selections:
-            self.plot_trace_cursor.remove_selection(sel)
+    def update_multiple_markers(self):
+        """ put the points marked with several annotations, except the one annotated, into the markers """
+        marks: MarkedPoints = self._trace_multiple_marks
+        shown: np.ndarray = marks.keys != self._active_multiple_mark
+        self._trace_multiple_markers.set_offsets(np.column_stack((marks.frequencies[shown], marks.voltages[shown])))
         self._canvas.draw_idle()
 
+    def on_multiple_mark_deselect(self, event):
+        """ unmark the point marked with several annotations that is clicked with the deselect button """
+        cursor: mplcursors.Cursor = self.plot_trace_multiple_cursor
+        if event.button != 3 or not cursor.enabled or event.inaxes is not self._figure \
+                or event.canvas.widgetlock.locked() != event.dblclick:
+            return
+        key: Optional[int] = None
+        sel: Selection
+        for sel in cursor.selections:
+            if sel.annotation.contains(event)[0]:
+                key = sel.annotation.mark_key
+        if key is None:
+            rows: np.ndarray = self._trace_multiple_marks.within(*self._pick_square(event))
+            if not rows.size:
+                return
+            # the marker drawn last is on top
+            key = int(self._trace_multiple_marks.keys[rows[-1]])
+        self._trace_multiple_marks.remove((key,))
+        if key == self._active_multiple_mark:
+            self._active_multiple_mark = None
+            cursor.remove_selections(cursor.selections)
+        self.update_multiple_markers()
+
+    def mark_found_lines(self):
+        """ mark the lines found within the marked range, not marked yet, with the Mark Multiple cursor at once """
+        lines: slice = slice(*self._lines_index.index_range(*self._view.marks))
+        marks: MarkedPoints = self._trace_multiple_marks
+        marked: Set[Tuple[str, float]] = set(zip((marks.labels[trace] for trace in marks.traces.tolist()),
+                                                 marks.frequencies.tolist()))
+        keys: List[int] = []
+        frequencies: List[float] = []
+        voltages: List[float] = []
+        offsets: List[float] = []
+        labels: List[str] = []
+        trace: int
+        frequency: float
+        voltage: float
+        for trace, frequency, voltage in zip(self._lines_index.traces[lines].tolist(),
+                                             self._lines_index.frequencies[lines].tolist(),
+                                             self._lines_index.voltages[lines].tolist()):
+            if (self._plot_lines_labels[trace], frequency) in marked:
+                continue
+            keys.append(next(self._mark_keys))
+            frequencies.append(frequency)
+            voltages.append(voltage)
+            offsets.append(self.mean_around(trace, frequency))
+            labels.append(self._plot_lines_labels[trace])
+        if not keys:
+            return
+        # all at once, drawn once
+        marks.add(keys, frequencies, voltages, offsets, labels)
+        self._toolbar.trace_multiple_action.setChecked(True)
+        self.update_multiple_markers()
+
+    def clear_selections(self):
+        self._trace_multiple_marks.clear()
+        self._trace_marks.clear()
+        self._active_multiple_mark = None
+        self.plot_trace_multiple_cursor.remove_selections(self.plot_trace_multiple_cursor.selections)
+        self.plot_trace_cursor.remove_selections(self.plot_trace_cursor.selections)
+        self.update_multiple_markers()
+
+    @property
+    def marked_points(self) -> Optional[MarkedPoints]:
+        """ the points marked with the cursor enabled, if any """
+        if self.plot_trace_multiple_cursor.enabled:
+            return self._trace_multiple_marks
+        if self.plot_trace_cursor.enabled:
+            return self._trace_marks
+        return None
+
+    @property
+    def memory_usage(self) -> int:
+        """ the memory taken by the pyramids and the range statistics of the traces, in bytes """
+        # a trace loaded twice shares them
+        indices: Dict[int, Union[decimation.MinMaxPyramid, RangeStats]] = {id(item): item for item in
+                                                                            self._plot_pyramids + self._plot_stats}
+        return sum(item.nbytes for item in indices.values())
+
+    def _update_clear_tool_tip(self):
+        _translate: Callable[[str, str, Optional[str], int], str] = QCoreApplication.translate
+        tool_tip: str = _translate("plot toolbar action", "Clear lines and markers")
+        memory_usage: int = self.memory_usage
+        if memory_usage:
+            tool_tip += '\n' + _translate("plot toolbar action",
+                                          "The traces take {:.1f} MiB to be drawn and averaged fast").format(
+                memory_usage / (1 << 20))
+        self._toolbar.clear_action.setToolTip(tool_tip)
+
     def clear(self):
+        self.cancel_loading()
         self._plot_voltages = [np.empty(0)] * LINES_COUNT
-        self._plot_frequencies = [np.empty(0)] * LINES_COUNT
+        self._plot_pyramids = [decimation.MinMaxPyramid(np.empty(0))] * LINES_COUNT
+        self._plot_stats = [RangeStats(np.empty(0))] * LINES_COUNT
+        self._plot_frequencies = [UniformAxis()] * LINES_COUNT
+        self._plot_file_ids = [None] * LINES_COUNT
+        self._plot_detectors = [None] * LINES_COUNT
+        self._plot_envelopes = [(np.empty(0), np.empty(0))] * LINES_COUNT
+        self._update_clear_tool_tip()
         line: Line2D
         for line in self._plot_lines:
             line.set_data(np.empty(0), np.empty(0))
@@ -804,84 +1191,161 @@ class Plot:
         _filter: str
         filename, _filter = self.open_file_dialog(_filter="Spectrometer Settings (*.fmd);;All Files (*)")
         fn = os.path.splitext(filename)[0]
-        _min_frequency: Optional[float] = self._min_frequency
-        _max_frequency: Optional[float] = self._max_frequency
-        if os.path.exists(fn + '.fmd'):
-            with open(fn + '.fmd', 'r') as fin:
-                line: str
-                for line in fin:
-                    if line and not line.startswith('*'):
-                        t = list(map(lambda w: w.strip(), line.split(':', maxsplit=1)))
-                        if len(t) > 1:
-                            if t[0].lower() == 'FStart [GHz]'.lower():
-                                _min_frequency = float(t[1])
-                            elif t[0].lower() == 'FStop [GHz]'.lower():
-                                _max_frequency = float(t[1])
-        else:
+        if not os.path.exists(fn + '.fmd') or not os.path.exists(fn + '.frd'):
+            return
+        self.cancel_loading()
+        file_id: sweep_cache.FileId = sweep_cache.file_id(fn + '.frd')
+        if file_id in self._plot_file_ids:
+            # the very same file is already loaded, so all that's known of it is taken from there
+            slot: int = self._plot_file_ids.index(file_id)
+            frequencies: UniformAxis = self._plot_frequencies[slot]
+            min_voltage: float
+            max_voltage: float
+            min_voltage, max_voltage = self._plot_pyramids[slot].range_min_max(0, frequencies.size)
+            self._add_trace(fn, workers.SweepData(file_id=file_id,
+                                                  min_frequency=frequencies.start, max_frequency=frequencies.stop,
+                                                  frequencies=frequencies, voltages=self._plot_voltages[slot],
+                                                  pyramid=self._plot_pyramids[slot], stats=self._plot_stats[slot],
+                                                  min_voltage=min_voltage, max_voltage=max_voltage),
+                            self._plot_detectors[slot])
+            return
+        loader: workers.SweepLoader = workers.SweepLoader(fn, self._sweep_cache,
+                                                          min_frequency=self._min_frequency,
+                                                          max_frequency=self._max_frequency,
+                                                          parent=self._toolbar)
+        loader.finished.connect(loader.deleteLater)
+        loader.progress.connect(lambda done, total: self.on_loading_progress(loader, done, total))
+        loader.loaded.connect(lambda data: self.on_data_loaded(loader, data))
+        loader.failed.connect(lambda message: self.on_loading_failed(loader, message))
+        loader.finished.connect(lambda: self.on_loading_finished(loader))
+        self._sweep_loader = loader
+        self._toolbar.progress_bar.setRange(0, 0)
+        self._update_progress_widgets()
+        loader.start()
+
+    def _update_progress_widgets(self):
+        busy: bool = self._sweep_loader is not None or self._lines_finder is not None
+        self._toolbar.progress_action.setVisible(busy)
+        self._toolbar.cancel_action.setVisible(busy)
+
+    def cancel(self):
+        self.cancel_loading()
+        self.cancel_finding_lines()
+        self._lines_replaced_finders.clear()
+
+    def cancel_loading(self, wait: bool = False):
+        """ stop loading the data; the loader finishes the step that can't be interrupted in the background """
+        if self._sweep_loader is not None:
+            loader: workers.SweepLoader = self._sweep_loader
+            self._sweep_loader = None
+            loader.requestInterruption()
+            self._cancelled_sweep_loaders.append(loader)
+            self._update_progress_widgets()
+        if wait:
+            for loader in self._cancelled_sweep_loaders:
+                loader.wait()
+            self._cancelled_sweep_loaders.clear()
+
+    def on_loading_progress(self, loader: workers.SweepLoader, done: int, total: int):
+        if loader is not self._sweep_loader:
+            return
+        if not total:  # the loader can't tell how far it is
+            self._toolbar.progress_bar.setRange(0, 0)
+            return
+        self._toolbar.progress_bar.setRange(0, 1000)
+        self._toolbar.progress_bar.setValue(round(1000 * done / total))
+
+    def on_loading_failed(self, loader: workers.SweepLoader, message: str):
+        if loader is not self._sweep_loader:
+            return
+        QMessageBox.critical(self._canvas.parent(), "Error loading file", message,
+                             QMessageBox.Ok, QMessageBox.NoButton)
+
+    def on_loading_finished(self, loader: workers.SweepLoader):
+        if loader in self._cancelled_sweep_loaders:
+            self._cancelled_sweep_loaders.remove(loader)
+        if loader is not self._sweep_loader:
             return
-        if os.path.exists(fn + '.frd'):
-            self._plot_voltages = self._plot_voltages[1:] + [np.loadtxt(fn + '.frd', usecols=(0,))]
-            self._plot_frequencies = self._plot_frequencies[1:] + [np.linspace(_min_frequency, _max_frequency,
-                                                                               num=self._plot_voltages[-1].size,
-                                                                               endpoint=False)]
-            new_label_base: str = os.path.split(fn)[-1]
-            new_label: str = new_label_base
-            i: int = 1
-            while new_label in self._plot_lines_labels[1:]:
-                i += 1
-                new_label = f'{new_label_base} ({i})'
-            self._plot_lines_labels = self._plot_lines_labels[1:] + [new_label]
-            self._min_frequency = nonemin((_min_frequency, self._min_frequency))
-            self._max_frequency = nonemax((_max_frequency, self._max_frequency))
-            self._min_voltage = nonemin((self._min_voltage, np.min(self._plot_voltages[-1])))
-            self._max_voltage = nonemax((self._max_voltage, np.max(self._plot_voltages[-1])))
-            self.draw_data((self._min_mark, self._max_mark))
-
-            if any(map(lambda l: not l.startswith('_'), self._plot_lines_labels)):
-                if self._legend is not None:
-                    self._legend.remove()
-                labels: List[str] = []
-                lines: List[Line2D] = []
-                lbl: str
-                for i, lbl in enumerate(self._plot_lines_labels):
-                    if not lbl.startswith('_'):
-                        labels.append(lbl)
-                        lines.append(self._plot_mark_lines[i])
-                if self._legend_figure is not None:
-                    self._legend = self._legend_figure.legend(lines, labels, frameon=False,
-                                                              loc='center', facecolor='red')
-                    self._legend_figure.canvas.draw()
-                    we: Bbox = self._legend.get_window_extent()
-                    self._legend_figure.canvas.setMinimumWidth(we.width)
-                    self._legend_figure.canvas.setMaximumWidth(we.width)
-                    self._legend_figure.canvas.setMinimumHeight(we.height)
-                    self._legend_figure.canvas.setMaximumHeight(we.height)
-                    self._legend_figure.canvas.draw()
-                    # self._legend_figure.canvas.setVisible(True)
-                    _leg_line: Line2D
-                    for _leg_line in self._legend.get_lines():
-                        _leg_line.pickradius = 5
-                        _leg_line.set_picker(True)
-
-            self._toolbar.clear_action.setEnabled(True)
-            self._toolbar.zoom_action.setEnabled(True)
-            self._toolbar.pan_action.setEnabled(True)
-            self._toolbar.mark_action.setEnabled(True)
-            self._toolbar.save_data_action.setEnabled(True)
-            self._toolbar.save_figure_action.setEnabled(True)
-            self._toolbar.trace_action.setEnabled(True)
-            self._toolbar.trace_multiple_action.setEnabled(True)
-            self._toolbar.copy_trace_action.setEnabled(True)
-            self._toolbar.save_trace_action.setEnabled(True)
-            self._toolbar.clear_trace_action.setEnabled(True)
-            self._toolbar.configure_action.setEnabled(True)
-
-            if self.on_data_loaded_callback is not None and callable(self.on_data_loaded_callback):
-                self.on_data_loaded_callback((self._min_frequency, self._max_frequency,
-                                              self._min_voltage, self._max_voltage))
+        self._sweep_loader = None
+        self._update_progress_widgets()
 
+    def on_data_loaded(self, loader: workers.SweepLoader, data: workers.SweepData):
+        if loader is not self._sweep_loader:
             return
-        return
+        self._add_trace(loader.fn, data)
+
+    def _add_trace(self, fn: str, data: workers.SweepData, detector: Optional[detection.LineDetector] = None):
+        """
+        Put the trace in place of the first one and draw it.
+
+        :param fn: the file name of the trace without extension
+        :param data: the trace
+        :param detector: the lines detector of the trace, if it's been made already
+        """
+        self._plot_voltages = self._plot_voltages[1:] + [data.voltages]
+        self._plot_pyramids = self._plot_pyramids[1:] + [data.pyramid]
+        self._plot_stats = self._plot_stats[1:] + [data.stats]
+        self._plot_file_ids = self._plot_file_ids[1:] + [data.file_id]
+        self._plot_detectors = self._plot_detectors[1:] + [detector]
+        self._lines_index.pop_trace(0)
+        self.update_found_lines()
+        self._plot_frequencies = self._plot_frequencies[1:] + [data.frequencies]
+        new_label_base: str = os.path.split(fn)[-1]
+        new_label: str = new_label_base
+        i: int = 1
+        while new_label in self._plot_lines_labels[1:]:
+            i += 1
+            new_label = f'{new_label_base} ({i})'
+        self._plot_lines_labels = self._plot_lines_labels[1:] + [new_label]
+        self._min_frequency = nonemin((data.min_frequency, self._min_frequency))
+        self._max_frequency = nonemax((data.max_frequency, self._max_frequency))
+        self._min_voltage = nonemin((self._min_voltage, data.min_voltage))
+        self._max_voltage = nonemax((self._max_voltage, data.max_voltage))
+        self._update_clear_tool_tip()
+        self.draw_data()
+
+        if any(map(lambda l: not l.startswith('_'), self._plot_lines_labels)):
+            if self._legend is not None:
+                self._legend.remove()
+            labels: List[str] = []
+            lines: List[Line2D] = []
+            lbl: str
+            for i, lbl in enumerate(self._plot_lines_labels):
+                if not lbl.startswith('_'):
+                    labels.append(lbl)
+                    lines.append(self._plot_mark_lines[i])
+            if self._legend_figure is not None:
+                self._legend = self._legend_figure.legend(lines, labels, frameon=False,
+                                                          loc='center', facecolor='red')
+                self._legend_figure.canvas.draw()
+                we: Bbox = self._legend.get_window_extent()
+                self._legend_figure.canvas.setMinimumWidth(we.width)
+                self._legend_figure.canvas.setMaximumWidth(we.width)
+                self._legend_figure.canvas.setMinimumHeight(we.height)
+                self._legend_figure.canvas.setMaximumHeight(we.height)
+                self._legend_figure.canvas.draw()
+                # self._legend_figure.canvas.setVisible(True)
+                _leg_line: Line2D
+                for _leg_line in self._legend.get_lines():
+                    _leg_line.pickradius = 5
+                    _leg_line.set_picker(True)
+
+        self._toolbar.clear_action.setEnabled(True)
+        self._toolbar.zoom_action.setEnabled(True)
+        self._toolbar.pan_action.setEnabled(True)
+        self._toolbar.mark_action.setEnabled(True)
+        self._toolbar.save_data_action.setEnabled(True)
+        self._toolbar.save_figure_action.setEnabled(True)
+        self._toolbar.trace_action.setEnabled(True)
+        self._toolbar.trace_multiple_action.setEnabled(True)
+        self._toolbar.copy_trace_action.setEnabled(True)
+        self._toolbar.save_trace_action.setEnabled(True)
+        self._toolbar.clear_trace_action.setEnabled(True)
+        self._toolbar.configure_action.setEnabled(True)
+
+        if self.on_data_loaded_callback is not None and callable(self.on_data_loaded_callback):
+            self.on_data_loaded_callback((self._min_frequency, self._max_frequency,
+                                          self._min_voltage, self._max_voltage))
 
     @property
     def mode(self):
@@ -926,6 +1390,7 @@ class Plot:
         self.plot_trace_cursor.visible = new_value
         self.plot_trace_multiple_cursor.enabled = False
         self.plot_trace_multiple_cursor.visible = False
+        self._trace_multiple_markers.set_visible(False)
 
     def plot_trace_multiple_action_toggled(self, new_value: bool):
         if new_value:
@@ -940,51 +1405,23 @@ class Plot:
         self.plot_trace_cursor.visible = False
         self.plot_trace_multiple_cursor.enabled = new_value
         self.plot_trace_multiple_cursor.visible = new_value
+        self._trace_multiple_markers.set_visible(new_value)
+        self._canvas.draw_idle()
 
     def plot_copy_trace_action_triggered(self):
         sep: str = '\t'
-        table: str = ''
-        selections: List[Selection] = []
-        if self.plot_trace_multiple_cursor.enabled:
-            selections = self.plot_trace_multiple_cursor.selections
-        elif self.plot_trace_cursor.enabled:
-            selections = self.plot_trace_cursor.selections
-        sel: Selection
-        for sel in selections:
-            x, y = sel.target.tolist()
-            offset = sel.target.offset
-            table += f'{x}{sep}{y}{sep}{y - offset}{sep}"{sel.annotation.original_label}"' + os.linesep
+        marks: Optional[MarkedPoints] = self.marked_points
+        if marks is None:
+            return
+        table: str = ''.join(f'{x}{sep}{y}{sep}{y - offset}{sep}"{marks.labels[trace]}"' + os.linesep
+                             for x, y, offset, trace in zip(marks.frequencies.tolist(), marks.voltages.tolist(),
+                                                            marks.offsets.tolist(), marks.traces.tolist()))
         if table:
             QGuiApplication.clipboard().setText(table)
 
     def plot_save_trace_action_triggered(self):
-        selections: List[Selection] = []
-        if self.plot_trace_multiple_cursor.enabled:
-            selections = self.plot_trace_multiple_cursor.selections
-        elif self.plot_trace_cursor.enabled:
-            selections = self.plot_trace_cursor.selections
-
-        labels: List[str] = []
-        for sel in selections:
-            label = sel.annotation.original_label
-            if label not in labels:
-                labels.append(label)
-
-        data: Dict[str, Tuple[List[float], List[float], List[float]]] = dict()
-        for label in labels:
-            picked_x: List[float] = []
-            picked_y: List[float] = []
-            picked_dy: List[float] = []
-            for sel in selections:
-                if sel.annotation.original_label != label:
-                    continue
-                x, y = sel.target.tolist()
-                picked_x.append(x)
-                picked_y.append(y)
-                picked_dy.append(y - sel.target.offset)
-            if not picked_x or not picked_y:
-                continue
-            data[label] = (picked_x, picked_y, picked_dy)
+        marks: Optional[MarkedPoints] = self.marked_points
+        data: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = marks.groups() if marks is not None else dict()
 
         filename: str
         _filter: str
@@ -1007,19 +1444,13 @@ class Plot:
         if 'CSV' in _filter:
             if filename_parts[1] != '.csv':
                 filename += '.csv'
-            x: np.ndarray = self._plot_frequencies[-1]
+            x: UniformAxis = self._plot_frequencies[-1]
             y: np.ndarray = self._plot_voltages[-1]
-            if self._max_mark is not None:
-                good: np.ndarray = (x <= self._max_mark)
-                x = x[good]
-                y = y[good]
-                del good
-            if self._min_mark is not None:
-                good: np.ndarray = (x >= self._min_mark)
-                x = x[good]
-                y = y[good]
-                del good
-            data: np.ndarray = np.vstack((x, y)).transpose()
+            lower: int
+            upper: int
+            lower, upper = x.index_range(*self._view.marks)
+            upper = max(lower, upper)
+            data: np.ndarray = np.vstack((x[lower:upper], y[lower:upper])).transpose()
             sep: str = '\t'
             # noinspection PyTypeChecker
             np.savetxt(filename, data,
@@ -1030,26 +1461,36 @@ class Plot:
             if filename_parts[1] != '.xlsx':
                 filename += '.xlsx'
             with pd.ExcelWriter(filename) as writer:
-                x: np.ndarray
+                # Excel tells the sheet names apart regardless of the case
+                used_sheet_names: List[str] = []
+                x: UniformAxis
                 y: np.ndarray
                 i: int
                 for i, (x, y) in enumerate(zip(self._plot_frequencies, self._plot_voltages)):
                     if self._plot_lines_labels[i].startswith('_*empty*_'):
                         continue
-                    if self._max_mark is not None:
-                        good: np.ndarray = (x <= self._max_mark)
-                        x = x[good]
-                        y = y[good]
-                        del good
-                    if self._min_mark is not None:
-                        good: np.ndarray = (x >= self._min_mark)
-                        x = x[good]
-                        y = y[good]
-                        del good
-                    data: np.ndarray = np.vstack((x, y)).transpose()
+                    used_sheet_names.append(self._plot_lines_labels[i].casefold())
+                    lower: int
+                    upper: int
+                    lower, upper = x.index_range(*self._view.marks)
+                    upper = max(lower, upper)
+                    data: np.ndarray = np.vstack((x[lower:upper], y[lower:upper])).transpose()
                     df: pd.DataFrame = pd.DataFrame(data)
                     df.to_excel(writer, index=False, header=['Frequency [MHz]', 'Voltage [mV]'],
                                 sheet_name=self._plot_lines_labels[i])
+                if len(self._lines_index):
+                    lines_sheet_name: str = 'Found Lines'
+                    i = 1
+                    while lines_sheet_name.casefold() in used_sheet_names:
+                        i += 1
+                        lines_sheet_name = f'Found Lines ({i})'
+                    lines: slice = slice(*self._lines_index.index_range(*self._view.marks))
+                    pd.DataFrame({'Frequency [MHz]': self._lines_index.frequencies[lines],
+                                  'Voltage [mV]': self._lines_index.voltages[lines],
+                                  'Score': self._lines_index.scores[lines],
+                                  'Template Width': self._lines_index.widths[lines],
+                                  'Trace': [self._plot_lines_labels[i] for i in self._lines_index.traces[lines]]}) \
+                        .to_excel(writer, index=False, sheet_name=lines_sheet_name)
 
     def save_figure(self):
         # TODO: add legend to the figure to save
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+
+def prefix_sums(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the sums of the first `i` values for `i` in `range(values.size + 1)`.
+
+    The sums are returned as the sum of two arrays: the values `np.cumsum` gives,
+    and the accumulated rounding errors of them, each found exactly from the neighbouring sums.
+    """
+    rounded: np.ndarray = np.empty(values.size + 1)
+    rounded[0] = 0.0
+    np.cumsum(values, out=rounded[1:])
+    errors: np.ndarray = np.empty(values.size + 1)
+    errors[0] = 0.0
+    # the error-free transformation of `rounded[:-1] + values` into `rounded[1:] + errors[1:]`
+    added: np.ndarray = np.subtract(rounded[1:], rounded[:-1])
+    np.subtract(rounded[1:], added, out=errors[1:])
+    np.subtract(rounded[:-1], errors[1:], out=errors[1:])
+    np.subtract(values, added, out=added)
+    np.add(errors[1:], added, out=errors[1:])
+    np.cumsum(errors, out=errors)
+    return rounded, errors
+
+
+def shifted_values(values: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray], float]:
+    """
+    Shift the values by their mean, for the sums of the squares not to be far larger than the squared deviations
+    they are used to find, and put zeros in place of NaN for the sums to skip them.
+
+    :return: the values shifted, the numbers of NaN among the first `i` values for `i` in `range(values.size + 1)`
+             or `None` if there is no NaN, and the shift
+    """
+    not_a_number: np.ndarray = np.isnan(values)
+    if np.any(not_a_number):
+        shift: float = float(np.mean(values[~not_a_number])) if not np.all(not_a_number) else 0.0
+        return (np.where(not_a_number, 0.0, values - shift),
+                np.concatenate(([0], np.cumsum(not_a_number))), shift)
+    shift = float(np.mean(values)) if values.size else 0.0
+    return values - shift, None, shift
+
+
+def variance(sums: Union[float, np.ndarray], sums_squared: Union[float, np.ndarray], count: int,
+             ddof: int = 0) -> np.ndarray:
+    """ the variance of `count` values from the sums of the values and of their squares, shifted as above """
+    result: np.ndarray = np.asarray((sums_squared - np.square(sums) / count) / (count - ddof))
+    np.maximum(result, 0.0, out=result)  # the rounding might make it slightly negative
+    return result
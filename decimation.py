@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+from typing import Final, List, Tuple
+
+import numpy as np
+
+
+def _arg_extrema(blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The indices of the minimum and the maximum within every row of `blocks`, ignoring NaN.
+
+    A row of NaN only gives the index of a NaN, the first one.
+    """
+    not_a_number: np.ndarray = np.isnan(blocks)
+    if not np.any(not_a_number):
+        return np.argmin(blocks, axis=-1), np.argmax(blocks, axis=-1)
+    return (np.argmin(np.where(not_a_number, np.inf, blocks), axis=-1),
+            np.argmax(np.where(not_a_number, -np.inf, blocks), axis=-1))
+
+
+def _blocks_extrema(y: np.ndarray, block_size: int, index_type: type = np.intp) -> np.ndarray:
+    """
+    The indices of the minimum and the maximum within every `block_size` consecutive points, ignoring NaN.
+
+    :param y: the data to split into blocks, the last one possibly shorter
+    :param block_size: the number of points in a block
+    :param index_type: the type of the indices returned
+    :return: the (argmin, argmax) pairs of the blocks, as indices within `y`
+    """
+    blocks_count: int = y.size // block_size
+    pairs: np.ndarray = np.empty((-(-y.size // block_size), 2), dtype=index_type)
+    blocks: np.ndarray = y[:blocks_count * block_size].reshape(blocks_count, block_size)
+    offsets: np.ndarray = np.arange(0, blocks_count * block_size, block_size)
+    min_indices: np.ndarray
+    max_indices: np.ndarray
+    min_indices, max_indices = _arg_extrema(blocks)
+    np.add(min_indices, offsets, out=pairs[:blocks_count, 0], casting='unsafe')
+    np.add(max_indices, offsets, out=pairs[:blocks_count, 1], casting='unsafe')
+    if blocks_count < pairs.shape[0]:
+        tail_start: int = blocks_count * block_size
+        pairs[-1] = np.add(_arg_extrema(y[tail_start:]), tail_start)
+    return pairs
+
+
+def min_max_indices(y: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    Find the points to draw `y` with when there are `block_size` points per pixel column or so.
+
+    The data are split into blocks of `block_size` consecutive points, and the indices of the minimum
+    and the maximum within every block are kept, so that no narrow peak or dip gets lost.
+    NaN is ignored unless a block is all NaN.
+
+    :param y: the data to decimate
+    :param block_size: the number of points represented by the pair of points kept
+    :return: the ascending indices of the points to draw
+    """
+    if block_size <= 2 or y.size <= 2:
+        return np.arange(y.size)
+    return np.sort(_blocks_extrema(y, block_size), axis=1).ravel()
+
+
+class MinMaxPyramid:
+    """
+    The indices of the minima and the maxima of a trace within blocks of 2ⁿ points, for every n from `FIRST_LEVEL` up.
+
+    Each level is a contiguous array of (argmin, argmax) pairs, `int32` for traces of up to 2³¹ points,
+    so the levels take about a half of the memory a `float64` trace does.
+    The points for any view get sliced from the level fitting the view, and the extrema of any range
+    are found in O(log N). Both are taken from the trace itself, so they are the data points exactly.
+    NaN is ignored the way `np.nanmin` and `np.nanmax` do, so a block points to a NaN only if it's all NaN.
+    """
+
+    FIRST_LEVEL: Final[int] = 2
+
+    def __init__(self, y: np.ndarray):
+        self._y: np.ndarray = y
+        self.levels: List[np.ndarray] = []
+
+        block_size: int = 1 << self.FIRST_LEVEL
+        if y.size < block_size:
+            return
+        index_type: type = np.int32 if y.size <= np.iinfo(np.int32).max else np.int64
+        level: np.ndarray = _blocks_extrema(y, block_size, index_type)
+        self.levels.append(level)
+
+        while level.shape[0] > 1:
+            pairs_count: int = level.shape[0] // 2
+            next_level: np.ndarray = np.empty((level.shape[0] - pairs_count, 2), dtype=index_type)
+            left: np.ndarray = level[0:2 * pairs_count:2]
+            right: np.ndarray = level[1:2 * pairs_count:2]
+            left_y: np.ndarray = y[left]
+            right_y: np.ndarray = y[right]
+            # take the left index on a tie and anything over NaN, the way `_arg_extrema` does
+            next_level[:pairs_count, 0] = np.where((left_y[:, 0] <= right_y[:, 0]) | np.isnan(right_y[:, 0]),
+                                                   left[:, 0], right[:, 0])
+            next_level[:pairs_count, 1] = np.where((left_y[:, 1] >= right_y[:, 1]) | np.isnan(right_y[:, 1]),
+                                                   left[:, 1], right[:, 1])
+            if pairs_count < next_level.shape[0]:
+                next_level[-1] = level[-1]
+            level = next_level
+            self.levels.append(level)
+
+    @property
+    def nbytes(self) -> int:
+        """ the memory taken by the levels """
+        return sum(level.nbytes for level in self.levels)
+
+    @staticmethod
+    def _aligned(lower: int, upper: int, block_size: int) -> Tuple[int, int]:
+        """ the part of `[lower, upper)` made of whole blocks """
+        aligned_lower: int = min(-(-lower // block_size) * block_size, upper)
+        return aligned_lower, max(upper // block_size * block_size, aligned_lower)
+
+    def envelope(self, lower: int, upper: int, block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the points to draw `y[lower:upper]` with when there are `block_size` points per pixel column or so.
+
+        :param lower: the first index of the range
+        :param upper: the index next to the last one of the range
+        :param block_size: the number of points represented by a pair of points at most
+        :return: the ascending indices of the points, where the x values are to be taken, and the y values
+        """
+        lower = max(lower, 0)
+        upper = min(upper, self._y.size)
+        level_index: int = block_size.bit_length() - 1 - self.FIRST_LEVEL
+        indices: np.ndarray
+        if level_index < 0 or not self.levels:
+            indices = min_max_indices(self._y[lower:upper], block_size) + lower
+            return indices, self._y[indices]
+        level_index = min(level_index, len(self.levels) - 1)
+        shift: int = level_index + self.FIRST_LEVEL
+        block_size = 1 << shift
+        aligned_lower: int
+        aligned_upper: int
+        aligned_lower, aligned_upper = self._aligned(lower, upper, block_size)
+        head: np.ndarray = min_max_indices(self._y[lower:aligned_lower], block_size) + lower
+        tail: np.ndarray = min_max_indices(self._y[aligned_upper:upper], block_size) + aligned_upper
+        # the extrema of a block go in the order they are in the trace
+        indices = np.concatenate((head,
+                                  np.sort(self.levels[level_index][aligned_lower >> shift:aligned_upper >> shift],
+                                          axis=1).ravel(),
+                                  tail))
+        return indices, self._y[indices]
+
+    def range_min_max(self, lower: int, upper: int) -> Tuple[float, float]:
+        """ the extrema of `y[lower:upper]` ignoring NaN, the same as `np.nanmin` and `np.nanmax` give, NaN for
+        an empty range or a range of NaN only """
+        lower = max(lower, 0)
+        upper = min(upper, self._y.size)
+        if lower >= upper:
+            return np.nan, np.nan
+        aligned_lower: int
+        aligned_upper: int
+        aligned_lower, aligned_upper = self._aligned(lower, upper, 1 << self.FIRST_LEVEL)
+        if not self.levels:
+            aligned_lower = aligned_upper = upper
+        minima: List[float] = []
+        maxima: List[float] = []
+        for edge in (self._y[lower:aligned_lower], self._y[aligned_upper:upper]):
+            if edge.size:
+                # `np.fmin` and `np.fmax` ignore NaN, and give NaN for NaN only without a warning
+                minima.append(np.fmin.reduce(edge))
+                maxima.append(np.fmax.reduce(edge))
+        # go up the levels taking the blocks that stick out of the blocks of the next level
+        first: int = aligned_lower >> self.FIRST_LEVEL
+        last: int = aligned_upper >> self.FIRST_LEVEL
+        level: np.ndarray
+        for level in self.levels:
+            if first >= last:
+                break
+            if first & 1:
+                minima.append(self._y[level[first, 0]])
+                maxima.append(self._y[level[first, 1]])
+                first += 1
+            if last & 1 and first < last:
+                last -= 1
+                minima.append(self._y[level[last, 0]])
+                maxima.append(self._y[level[last, 1]])
+            first >>= 1
+            last >>= 1
+        return float(np.fmin.reduce(minima)), float(np.fmax.reduce(maxima))
+
+
+if __name__ == '__main__':
+    def main():
+        """ check the range extrema and the points drawn against `np.nanmin` and `np.nanmax` on random traces """
+        import warnings
+
+        rng: np.random.Generator = np.random.default_rng(0)
+        for _ in range(1000):
+            y: np.ndarray = rng.normal(size=rng.integers(1, 3000))
+            y[rng.random(y.size) < rng.random() ** 4] = np.nan
+            pyramid: MinMaxPyramid = MinMaxPyramid(y)
+            for _ in range(10):
+                lower: int = int(rng.integers(0, y.size))
+                upper: int = int(rng.integers(lower + 1, y.size + 1))
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', RuntimeWarning)  # for a range of NaN only
+                    expected: Tuple[float, float] = (np.nanmin(y[lower:upper]), np.nanmax(y[lower:upper]))
+                if not np.array_equal(pyramid.range_min_max(lower, upper), expected, equal_nan=True):
+                    raise AssertionError('MinMaxPyramid.range_min_max result differs from np.nanmin/np.nanmax one')
+                block_size: int = int(rng.integers(1, 300))
+                indices: np.ndarray = pyramid.envelope(lower, upper, block_size)[0]
+                if not np.array_equal((np.fmin.reduce(y[indices]), np.fmax.reduce(y[indices])), expected,
+                                      equal_nan=True):
+                    raise AssertionError('MinMaxPyramid.envelope misses the extrema of the range')
+        print('MinMaxPyramid agrees with np.nanmin and np.nanmax')
+
+
+    main()
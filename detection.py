@@ -1,100 +1,800 @@
 # -*- coding: utf-8 -*-
-from typing import Final
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Final, Iterator, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
+from compensated_sums import prefix_sums, shifted_values, variance
+
 
 LINE_WIDTH: Final[float] = 2.6
 
+# the longest kernel to correlate with directly; the longer ones are faster via FFT
+DIRECT_KERNEL_SIZE_LIMIT: Final[int] = 96
+
+# the number of points processed at once by the stages split into chunks;
+# the chunks are the same whether they are processed in parallel or not, so are the results
+CHUNK_SIZE: Final[int] = 1 << 16
+
+# the widths of the lines to look for relative to the model, the model one included;
+# the lines of the synthetic sweeps the benchmark below makes are 0.7 to 1.4 times as wide as the model
+TEMPLATE_WIDTHS: Final[Tuple[float, ...]] = (0.7, 1.0, 1.4)
+
+# the search for the lines within a part of a trace is done, and its results are kept, by tiles of that many points
+TILE_SIZE: Final[int] = 1 << 12
+
+# the spikes removal is done by dilation, erosion by one more point, and dilation by one point,
+# so a point of the result depends on the points within `PEAKS_REACH` at each side
+SPIKES_ITERATIONS: Final[int] = 8
+PEAKS_REACH: Final[int] = 2 * SPIKES_ITERATIONS + 2
+
+# the chunks get their own pool, for the tasks of a pool of traces not to wait for the threads they occupy
+_chunks_pool: Optional[ThreadPoolExecutor] = None
+_chunks_pool_lock: threading.Lock = threading.Lock()
+
+
+def _for_each_chunk(function: Callable[[int, int], Any], size: int, parallel: bool = False,
+                    chunk_size: int = CHUNK_SIZE):
+    """
+    Call `function(start, stop)` for every `chunk_size`-long chunk of `range(size)`.
+
+    With `parallel`, the calls are made in a pool of threads if there are several cores.
+    numpy releases the GIL within the array operations, so the threads do run at once.
+    """
+    global _chunks_pool
+
+    bounds: List[Tuple[int, int]] = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+    if not parallel or len(bounds) < 2 or (os.cpu_count() or 1) < 2:
+        start: int
+        stop: int
+        for start, stop in bounds:
+            function(start, stop)
+        return
+    with _chunks_pool_lock:
+        if _chunks_pool is None:
+            _chunks_pool = ThreadPoolExecutor(thread_name_prefix='detection')
+    # `list` re-raises the exceptions from the calls
+    list(_chunks_pool.map(function, *zip(*bounds)))
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """ the sums of every `window` consecutive values """
+    prefix: np.ndarray
+    prefix_errors: np.ndarray
+    prefix, prefix_errors = prefix_sums(values)
+    sums: np.ndarray = np.subtract(prefix[window:], prefix[:-window])
+    sums += prefix_errors[window:]
+    sums -= prefix_errors[:-window]
+    return sums
+
+
+def _rolling_sums(data: np.ndarray, window: int,
+                  parallel: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """
+    Get the sums of the values and of the squared values within every `window` consecutive points.
+
+    The data are shifted by `shifted_values` first.
+    The sums are accumulated chunk by chunk, each chunk overlapping the next one by `window - 1` points.
+
+    :return: the sums, the sums of the squares, whether there is a NaN within the window, and the shift
+    """
+    shifted: np.ndarray
+    nan_counts: Optional[np.ndarray]
+    shift: float
+    shifted, nan_counts, shift = shifted_values(data)
+    has_nan: np.ndarray
+    if nan_counts is not None:
+        has_nan = (nan_counts[window:] - nan_counts[:-window]) > 0
+    else:
+        has_nan = np.zeros(data.size - window + 1, dtype=np.bool_)
+    sums: np.ndarray = np.empty(data.size - window + 1)
+    sums_squared: np.ndarray = np.empty(data.size - window + 1)
+
+    def chunk_sums(start: int, stop: int):
+        chunk: np.ndarray = shifted[start:stop + window - 1]
+        sums[start:stop] = _window_sums(chunk, window)
+        sums_squared[start:stop] = _window_sums(np.square(chunk), window)
+
+    _for_each_chunk(chunk_sums, sums.size, parallel)
+    return sums, sums_squared, has_nan, shift
+
+
+def _centered(values: np.ndarray, size: int, window: int) -> np.ndarray:
+    """ place the values of the windows at their centers the way `pandas` does, padding with NaN """
+    result: np.ndarray = np.full(size, np.nan)
+    result[window // 2:window // 2 + values.size] = values
+    return result
+
+
+def rolling_mean(data: np.ndarray, window: int, parallel: bool = False) -> np.ndarray:
+    """
+    The same as `pd.Series(data).rolling(window, center=True).mean().to_numpy()` gives, but in pure numpy.
+    """
+    if window < 1:
+        raise ValueError('window must be positive')
+    data = np.asarray(data, dtype=np.float64)
+    if data.size < window:
+        return np.full(data.size, np.nan)
+    sums: np.ndarray
+    has_nan: np.ndarray
+    shift: float
+    sums, _, has_nan, shift = _rolling_sums(data, window, parallel)
+    mean: np.ndarray = sums / window + shift
+    mean[has_nan] = np.nan
+    return _centered(mean, data.size, window)
+
+
+def rolling_variance(data: np.ndarray, window: int, ddof: int = 1, parallel: bool = False) -> np.ndarray:
+    """
+    The same as `pd.Series(data).rolling(window, center=True).var(ddof=ddof).to_numpy()` gives,
+    but in pure numpy, in O(N) regardless of `window`.
+    """
+    if window < 1:
+        raise ValueError('window must be positive')
+    data = np.asarray(data, dtype=np.float64)
+    if data.size < window or window <= ddof:
+        return np.full(data.size, np.nan)
+    sums: np.ndarray
+    sums_squared: np.ndarray
+    has_nan: np.ndarray
+    sums, sums_squared, has_nan, _ = _rolling_sums(data, window, parallel)
+    result: np.ndarray = variance(sums, sums_squared, window, ddof)
+    result[has_nan] = np.nan
+    return _centered(result, data.size, window)
+
+
+def rolling_std(data: np.ndarray, window: int, ddof: int = 1, parallel: bool = False) -> np.ndarray:
+    """
+    The same as `pd.Series(data).rolling(window, center=True).std(ddof=ddof).to_numpy()` gives,
+    but in pure numpy, in O(N) regardless of `window`.
+    """
+    return np.sqrt(rolling_variance(data, window, ddof=ddof, parallel=parallel))
+
+
+def _runs(sequence: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ the starts and the stops of the runs of `True` in a boolean array """
+    edges: np.ndarray = np.diff(sequence.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _dilate_runs(starts: np.ndarray, stops: np.ndarray, size: int, iterations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ widen the runs by `iterations` at each side within `[0, size)`, merging the overlapping ones """
+    if not starts.size:
+        return starts, stops
+    starts = np.maximum(starts - iterations, 0)
+    stops = np.minimum(stops + iterations, size)
+    gaps: np.ndarray = starts[1:] > stops[:-1]
+    return starts[np.concatenate(([True], gaps))], stops[np.concatenate((gaps, [True]))]
+
+
+def _erode_runs(starts: np.ndarray, stops: np.ndarray, iterations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ narrow the runs by `iterations` at each side, removing the ones that vanish """
+    starts = starts + iterations
+    stops = stops - iterations
+    kept: np.ndarray = starts < stops
+    return starts[kept], stops[kept]
+
 
 def remove_spikes(sequence: np.ndarray, iterations: int = 1) -> np.ndarray:
-    from scipy import ndimage
+    """
+    Merge the runs of `True` separated by up to `2 * iterations` points, and remove the runs of 2 points or shorter.
+
+    The result is the same as that of `scipy.ndimage.binary_dilation(..., iterations=iterations)`,
+    `binary_erosion(..., iterations=iterations + 1)`, and `binary_dilation(..., iterations=1)` in a row,
+    but the morphology is done on the starts and the stops of the runs rather than on the points.
+    """
+    sequence = np.asarray(sequence, dtype=np.bool_)
+    starts: np.ndarray
+    stops: np.ndarray
+    starts, stops = _runs(sequence)
+    starts, stops = _dilate_runs(starts, stops, sequence.size, iterations)
+    starts, stops = _erode_runs(starts, stops, iterations + 1)
+    starts, stops = _dilate_runs(starts, stops, sequence.size, 1)
+    edges: np.ndarray = np.zeros(sequence.size + 1, dtype=np.int8)
+    edges[starts] = 1
+    edges[stops] -= 1
+    return np.cumsum(edges[:-1], dtype=np.int8).astype(np.bool_)
+
+
+class MatchedFilter:
+    """
+    Correlate signals with a fixed kernel, the same as `np.correlate(signal, kernel, 'same')` does.
+
+    For a long kernel, the correlation is computed via FFT by the overlap-save method, and the spectrum
+    of the kernel is computed once for every FFT size, so it's reused for all the signals of similar length.
+    """
+
+    def __init__(self, kernel: np.ndarray):
+        self.kernel: np.ndarray = np.asarray(kernel, dtype=np.float64)
+        self._spectra: Dict[int, np.ndarray] = dict()
+
+    def _fft_size(self, signal_size: int) -> int:
+        """ a power of 2 large enough for the kernel to take a small part of the block, but not too large """
+        kernel_size: int = self.kernel.size
+        return 1 << min(max(10, (8 * kernel_size - 1).bit_length()), (signal_size + kernel_size - 2).bit_length())
+
+    def _spectrum(self, fft_size: int) -> np.ndarray:
+        if fft_size not in self._spectra:
+            self._spectra[fft_size] = np.fft.rfft(self.kernel[::-1], fft_size)
+        return self._spectra[fft_size]
+
+    def _correlate_direct(self, signal: np.ndarray, parallel: bool = False) -> np.ndarray:
+        kernel_size: int = self.kernel.size
+        # padded so that the valid part of the correlation is the same-sized one
+        padded: np.ndarray = np.zeros(signal.size + kernel_size - 1)
+        padded[kernel_size // 2:kernel_size // 2 + signal.size] = signal
+        result: np.ndarray = np.empty(signal.size)
+
+        def correlate_chunk(start: int, stop: int):
+            result[start:stop] = np.correlate(padded[start:stop + kernel_size - 1], self.kernel, 'valid')
+
+        _for_each_chunk(correlate_chunk, signal.size, parallel)
+        return result
+
+    def _forward(self, signal: np.ndarray, parallel: bool = False) -> np.ndarray:
+        """ the spectra of the overlapping blocks of the signal the overlap-save method correlates block by block """
+        kernel_size: int = self.kernel.size
+        full_size: int = signal.size + kernel_size - 1
+        fft_size: int = self._fft_size(signal.size)
+        step: int = fft_size - kernel_size + 1
+        blocks_count: int = -(-full_size // step)
+        # the blocks overlap by `kernel_size - 1` points, the circular convolution garbage is there
+        padded: np.ndarray = np.zeros(blocks_count * step + kernel_size - 1)
+        padded[kernel_size - 1:kernel_size - 1 + signal.size] = signal
+        blocks: np.ndarray = np.lib.stride_tricks.as_strided(padded, shape=(blocks_count, fft_size),
+                                                             strides=(padded.strides[0] * step, padded.strides[0]),
+                                                             writeable=False)
+        spectra: np.ndarray = np.empty((blocks_count, fft_size // 2 + 1), dtype=np.complex128)
+
+        def transform_blocks(first: int, last: int):
+            spectra[first:last] = np.fft.rfft(blocks[first:last], axis=1)
+
+        # a chunk is a whole number of blocks of about `CHUNK_SIZE` points together
+        _for_each_chunk(transform_blocks, blocks_count, parallel, chunk_size=max(1, CHUNK_SIZE // step))
+        return spectra
+
+    def _inverse(self, spectra: np.ndarray, signal_size: int, parallel: bool = False) -> np.ndarray:
+        """ the correlation of the signal with the kernel from the spectra of the blocks of the signal """
+        kernel_size: int = self.kernel.size
+        blocks_count: int = spectra.shape[0]
+        fft_size: int = 2 * (spectra.shape[1] - 1)
+        step: int = fft_size - kernel_size + 1
+        spectrum: np.ndarray = self._spectrum(fft_size)
+        full: np.ndarray = np.empty((blocks_count, step))
+
+        def correlate_blocks(first: int, last: int):
+            full[first:last] = np.fft.irfft(spectra[first:last] * spectrum, fft_size, axis=1)[:, kernel_size - 1:]
+
+        _for_each_chunk(correlate_blocks, blocks_count, parallel, chunk_size=max(1, CHUNK_SIZE // step))
+        start: int = (kernel_size - 1) // 2
+        return full.ravel()[start:start + signal_size]
+
+    def _correlate_fft(self, signal: np.ndarray, parallel: bool = False) -> np.ndarray:
+        return self._inverse(self._forward(signal, parallel), signal.size, parallel)
+
+    def correlate(self, signal: np.ndarray, method: str = 'auto', parallel: bool = False) -> np.ndarray:
+        """
+        Correlate `signal` with the kernel.
+
+        :param signal: the data to correlate with the kernel
+        :param method: `'direct'`, `'fft'`, or `'auto'` to choose the faster one by the sizes
+        :param parallel: whether to process the chunks of the signal in several threads
+        :return: the correlation of the same size as the signal, or as the kernel if that's longer
+        """
+        if method not in ('auto', 'direct', 'fft'):
+            raise ValueError(f'Unknown correlation method: {method}')
+        signal = np.asarray(signal, dtype=np.float64)
+        if method == 'auto':
+            method = 'direct' if self.kernel.size <= DIRECT_KERNEL_SIZE_LIMIT else 'fft'
+        if signal.size < self.kernel.size or not self.kernel.size:
+            return np.correlate(signal, self.kernel, 'same')
+        if method == 'direct':
+            return self._correlate_direct(signal, parallel)
+        return self._correlate_fft(signal, parallel)
+
+
+@lru_cache(maxsize=None)
+def butter_sos(order: int, critical_frequencies: Union[float, Tuple[float, float]], btype: str) -> np.ndarray:
+    """
+    The second-order sections of a digital Butterworth filter, designed once for every set of parameters.
+
+    The array returned is shared, so it's not to be altered.
+    """
+    from scipy.signal import butter
+
+    return butter(order, critical_frequencies, btype=btype, output='sos')
 
-    sequence = ndimage.binary_dilation(sequence, iterations=iterations)
-    sequence = ndimage.binary_erosion(sequence, iterations=iterations + 1)
-    sequence = ndimage.binary_dilation(sequence, iterations=1)
-    return sequence
 
+class FilterBank:
+    """
+    Correlate signals with several kernels at once, the same as a `MatchedFilter` of every kernel does.
 
-def correlation(model_y, another_x: np.ndarray, another_y: np.ndarray) -> np.ndarray:
-    from scipy.signal import butter, lfilter
+    The kernels are padded with zeros to the same length around their centers, so via FFT,
+    the blocks of a signal get transformed once for all the kernels, and only the inverse transforms
+    are done for every kernel.
+    """
+
+    def __init__(self, kernels: Sequence[np.ndarray]):
+        if not kernels:
+            raise ValueError('No kernels given')
+        kernels = [np.asarray(kernel, dtype=np.float64) for kernel in kernels]
+        size: int = max(kernel.size for kernel in kernels)
+        self.filters: List[MatchedFilter] = []
+        kernel: np.ndarray
+        for kernel in kernels:
+            padded: np.ndarray = np.zeros(size)
+            # `np.correlate(..., 'same')` puts the result for `kernel[kernel.size // 2]` at the point
+            padded[size // 2 - kernel.size // 2:size // 2 - kernel.size // 2 + kernel.size] = kernel
+            self.filters.append(MatchedFilter(padded))
+
+    def __len__(self) -> int:
+        return len(self.filters)
+
+    def correlate(self, signal: np.ndarray, parallel: bool = False) -> Iterator[np.ndarray]:
+        """
+        Correlate `signal` with every kernel.
+
+        :param signal: the data to correlate with the kernels
+        :param parallel: whether to process the chunks of the signal in several threads
+        :return: the correlations with the kernels one by one, each of the same size as the signal
+        """
+        signal = np.asarray(signal, dtype=np.float64)
+        matched_filter: MatchedFilter
+        if signal.size < self.filters[0].kernel.size:
+            # unlike `np.correlate(..., 'same')`, the kernels longer than the signal give results of the signal size
+            for matched_filter in self.filters:
+                yield matched_filter._correlate_direct(signal, parallel=parallel)
+            return
+        if self.filters[0].kernel.size <= DIRECT_KERNEL_SIZE_LIMIT:
+            for matched_filter in self.filters:
+                yield matched_filter.correlate(signal, parallel=parallel)
+            return
+        spectra: np.ndarray = self.filters[0]._forward(signal, parallel)
+        for matched_filter in self.filters:
+            yield matched_filter._inverse(spectra, signal.size, parallel)
+
+
+class TemplateCache:
+    """
+    The matched filters made of a model signal resampled to the frequency steps of the data.
+
+    The model is interpolated once, and the filter for a step is made once, so are the spectra it keeps.
+    """
+
+    def __init__(self, model_y: np.ndarray, model_step: float = 0.1):
+        self.model_y: np.ndarray = np.asarray(model_y, dtype=np.float64)
+        self.model_step: float = model_step
+        self._interpolation: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        self._filters: Dict[float, MatchedFilter] = dict()
+        self._banks: Dict[Tuple[float, Tuple[float, ...]], FilterBank] = dict()
+
+    def _kernel(self, step: float, width: float = 1.0) -> np.ndarray:
+        """ the model stretched `width` times and resampled to `step` """
+        x_model: np.ndarray = np.arange(self.model_y.size, dtype=np.float64) * self.model_step
+        if self._interpolation is None:
+            from scipy import interpolate
+
+            self._interpolation = interpolate.interp1d(x_model, self.model_y, kind=2)
+        if width == 1.0:
+            return self._interpolation(np.arange(x_model[0], x_model[-1], step))
+        return self._interpolation(np.arange(x_model[0] * width, x_model[-1] * width, step) / width)
+
+    def matched_filter(self, step: float) -> MatchedFilter:
+        """ the filter of the model resampled to `step` """
+        if step not in self._filters:
+            self._filters[step] = MatchedFilter(self._kernel(step))
+        return self._filters[step]
+
+    def filter_bank(self, step: float, widths: Tuple[float, ...]) -> FilterBank:
+        """ the filters of the model stretched by each of `widths` and resampled to `step` """
+        if (step, widths) not in self._banks:
+            self._banks[step, widths] = FilterBank([self._kernel(step, width) for width in widths])
+        return self._banks[step, widths]
+
+
+def _prefiltered(another_x: np.ndarray, another_y: np.ndarray) -> np.ndarray:
+    from scipy.signal import sosfilt
 
     def butter_bandpass_filter(data: np.ndarray, low_cut: float, high_cut: float, order: int = 5):
-        def butter_bandpass():
+        def butter_bandpass() -> np.ndarray:
             nyq: float = 0.5 * fs
             low: float = low_cut / nyq
             high: float = high_cut / nyq
             if low > 0. and high < fs:
-                return butter(order, [low, high], btype='bandpass')
+                return butter_sos(order, (low, high), 'bandpass')
             if low > 0. and high >= fs:
-                return butter(order, low, btype='highpass')
+                return butter_sos(order, low, 'highpass')
             if low <= 0. and high < fs:
-                return butter(order, high, btype='lowpass')
+                return butter_sos(order, high, 'lowpass')
             raise ValueError
 
-        return lfilter(*butter_bandpass(), data)
+        return sosfilt(butter_bandpass(), data)
 
+    fs: float = 1.0 / (another_x[1] - another_x[0])
+    return butter_bandpass_filter(another_y, low_cut=0.005 * fs, high_cut=np.inf, order=5)
+
+
+def _normalize(_corr: np.ndarray) -> np.ndarray:
+    _corr -= np.mean(_corr)
+    _corr /= np.std(_corr)
+    return _corr
+
+
+def correlation(model_y: Union[np.ndarray, MatchedFilter], another_x: np.ndarray, another_y: np.ndarray,
+                parallel: bool = False) -> np.ndarray:
     if another_y.size:
-        fs: float = 1.0 / (another_x[1] - another_x[0])
-        another_y_filtered: np.ndarray = butter_bandpass_filter(another_y,
-                                                                low_cut=0.005 * fs, high_cut=np.inf,
-                                                                order=5)
-        _corr: np.ndarray = np.correlate(another_y_filtered, model_y, 'same')
-        _corr -= np.mean(_corr)
-        _corr /= np.std(_corr)
-        return _corr
+        another_y_filtered: np.ndarray = _prefiltered(another_x, another_y)
+        if not isinstance(model_y, MatchedFilter):
+            model_y = MatchedFilter(model_y)
+        # the filter is recursive, so only the correlation is split into chunks
+        return _normalize(model_y.correlate(another_y_filtered, parallel=parallel))
     return np.empty(0)
 
 
+def bank_correlation(bank: FilterBank, another_x: np.ndarray, another_y: np.ndarray,
+                     parallel: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Correlate the data with every kernel of the bank the way `correlation` does, and take the best match.
+
+    :return: the greatest of the correlations at every point, and the index of the kernel it's with
+    """
+    if not another_y.size:
+        return np.empty(0), np.empty(0, dtype=np.intp)
+    best: Optional[np.ndarray] = None
+    best_kernels: np.ndarray = np.zeros(another_y.size, dtype=np.intp)
+    index: int
+    _corr: np.ndarray
+    for index, _corr in enumerate(bank.correlate(_prefiltered(another_x, another_y), parallel=parallel)):
+        _normalize(_corr)
+        if best is None:
+            best = _corr
+            continue
+        better: np.ndarray = _corr > best
+        best_kernels[better] = index
+        np.maximum(best, _corr, out=best)
+    return best, best_kernels
+
+
+def islands_peaks(data_y: np.ndarray, islands: np.ndarray) -> np.ndarray:
+    """
+    Find the maxima of the data within the islands, skipping the ones at the left edges of the islands.
+
+    :param data_y: the data to find the peaks in
+    :param islands: the ascending non-overlapping `[start, stop)` index ranges to look for a peak within
+    :return: the indices of the peaks
+    """
+    if not islands.size:
+        return np.empty(0, dtype=np.intp)
+    starts: np.ndarray = islands[:, 0]
+    lengths: np.ndarray = islands[:, 1] - starts
+    maxima: np.ndarray = np.maximum.reduceat(data_y, islands.ravel())[::2]
+    # the indices of all the points within the islands, and the island of each one
+    island_numbers: np.ndarray = np.repeat(np.arange(starts.size), lengths)
+    positions: np.ndarray = np.arange(island_numbers.size) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    values: np.ndarray = data_y[positions]
+    # `np.argmax` takes the first NaN, if any, and the first occurrence of the maximum otherwise
+    is_maximum: np.ndarray = (values == maxima[island_numbers]) | np.isnan(values)
+    positions = positions[is_maximum]
+    island_numbers = island_numbers[is_maximum]
+    is_first: np.ndarray = np.empty(positions.size, dtype=np.bool_)
+    is_first[:1] = True
+    np.not_equal(island_numbers[1:], island_numbers[:-1], out=is_first[1:])
+    peaks: np.ndarray = positions[is_first]
+    return peaks[peaks != starts[island_numbers[is_first]]]
+
+
+def peaks_above(data_y: np.ndarray, std: np.ndarray, level: float) -> np.ndarray:
+    """ find the peaks of `data_y` within the regions where the rolling deviation `std` reaches `level` """
+    match: np.ndarray = remove_spikes(std >= level, iterations=SPIKES_ITERATIONS)
+    match[0] = match[-1] = False
+    islands: np.ndarray = np.argwhere(np.diff(match)).reshape(-1, 2)
+    return islands_peaks(data_y, islands)
+
+
 def peaks_positions(data_x: np.ndarray, data_y: np.ndarray, threshold: float = 0.0046228) -> np.ndarray:
-    import pandas as pd
     if data_x.size < 2 or data_y.size < 2:
         # nothing to do
-        return np.empty(0)
+        return np.empty(0, dtype=np.intp)
 
-    std: np.ndarray = pd.Series(data_y).rolling(round(LINE_WIDTH / (data_x[1] - data_x[0])),
-                                                center=True).std().to_numpy()
-    match: np.ndarray = np.array((std >= np.nanquantile(std, 1.0 - threshold)))
-    match = remove_spikes(match, iterations=8)
-    match[0] = match[-1] = False
-    islands: np.ndarray = np.argwhere(np.diff(match)).reshape(-1, 2)
-    peaks: np.ndarray = np.array([i[0] + np.argmax(data_y[i[0]:i[1]])
-                                  for i in islands
-                                  if (np.argmax(data_y[i[0]:i[1]]) not in (0, i[1] - i[0]))])
-    return peaks
+    std: np.ndarray = rolling_std(data_y, round(LINE_WIDTH / (data_x[1] - data_x[0])))
+    return peaks_above(data_y, std, np.nanquantile(std, 1.0 - threshold))
+
+
+class LineDetector:
+    """
+    Find the lines in a trace stage by stage, keeping the results of the stages that don't depend on the threshold.
+
+    The correlation with the model and its rolling deviation are calculated on the first call of `find`,
+    so the following calls only cut the deviation at a new level and look for the peaks.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, matched_filter: Union[MatchedFilter, FilterBank],
+                 parallel: bool = False):
+        """
+        :param x: the frequencies of the trace
+        :param y: the voltages of the trace
+        :param matched_filter: the filter of the model resampled to the frequency step of the trace,
+                               or a bank of such filters to take the best match of at every point
+        :param parallel: whether to split the long stages into chunks processed in several threads;
+                         the lines found are the same anyway
+        """
+        self.x: np.ndarray = x
+        self.y: np.ndarray = y
+        self.matched_filter: Union[MatchedFilter, FilterBank] = matched_filter
+        self.parallel: bool = parallel
+        self._correlation: Optional[np.ndarray] = None
+        self._kernels: Optional[np.ndarray] = None
+        self._std: Optional[np.ndarray] = None
+        self._finite_std: Optional[np.ndarray] = None
+        self._levels: Dict[float, float] = dict()
+        # the lines found within the tiles searched by their indices, all for `_tiles_level`
+        self._tiles: Dict[int, np.ndarray] = dict()
+        self._tiles_level: Optional[float] = None
+        # the stages might be requested from several threads at once
+        self._lock: threading.RLock = threading.RLock()
+
+    def _correlate(self):
+        with self._lock:
+            if self._correlation is None:
+                if isinstance(self.matched_filter, FilterBank):
+                    self._correlation, self._kernels = bank_correlation(self.matched_filter, self.x, self.y,
+                                                                        parallel=self.parallel)
+                else:
+                    self._correlation = correlation(self.matched_filter, self.x, self.y, parallel=self.parallel)
+                    self._kernels = np.zeros(self._correlation.size, dtype=np.intp)
+
+    @property
+    def correlation(self) -> np.ndarray:
+        self._correlate()
+        return self._correlation
+
+    @property
+    def kernels(self) -> np.ndarray:
+        """ the index of the kernel of the bank that matches the trace best at every point, zeros for one filter """
+        self._correlate()
+        return self._kernels
+
+    @property
+    def std(self) -> np.ndarray:
+        """ the rolling standard deviation of the correlation over a line width """
+        with self._lock:
+            if self._std is None:
+                std: np.ndarray = rolling_std(self.correlation, round(LINE_WIDTH / (self.x[1] - self.x[0])),
+                                              parallel=self.parallel)
+                self._finite_std = std[~np.isnan(std)]
+                self._std = std
+            return self._std
+
+    def level(self, threshold: float = 0.0046228) -> float:
+        """
+        The rolling deviation the lines are to reach, NaN if the deviation is unknown everywhere.
+
+        It's found over the whole trace, so the lines found within a part of the trace are the same
+        as the ones the search over the whole trace finds there.
+        """
+        with self._lock:
+            if threshold not in self._levels:
+                level: float = np.nan
+                if self.std.size and self._finite_std.size:
+                    level = float(np.quantile(self._finite_std, 1.0 - threshold))
+                self._levels[threshold] = level
+            return self._levels[threshold]
+
+    def _peaks_near(self, level: float, lower: int, upper: int) -> np.ndarray:
+        """ the same peaks `peaks_above` finds within `[lower, upper)` of the whole trace, searched near there """
+        std: np.ndarray = self.std
+        size: int = std.size
+        start: int = lower
+        stop: int = upper
+        while True:
+            first: int = max(start - PEAKS_REACH, 0)
+            last: int = min(stop + PEAKS_REACH, size)
+            match: np.ndarray = remove_spikes(std[first:last] >= level, iterations=SPIKES_ITERATIONS)
+            # the edges of the trace are never within an island
+            if first == 0:
+                match[0] = False
+            if last == size:
+                match[-1] = False
+            # only `[start, stop)` is the same as in the whole trace; widen it until no island crosses its edges
+            crossed_left: bool = bool(match[start - first])
+            crossed_right: bool = bool(match[stop - 1 - first])
+            if not crossed_left and not crossed_right:
+                break
+            if crossed_left:
+                start = max(start - (stop - start), 0)
+            if crossed_right:
+                stop = min(stop + (stop - start), size)
+        islands: np.ndarray = np.argwhere(np.diff(match[start - first:stop - first])).reshape(-1, 2) + start
+        peaks: np.ndarray = islands_peaks(self.correlation, islands)
+        return peaks[(peaks >= lower) & (peaks < upper)]
+
+    def find(self, threshold: float = 0.0046228, lower: int = 0, upper: Optional[int] = None) -> np.ndarray:
+        """
+        Find the lines within `y[lower:upper]`, the same as `peaks_positions(x, correlation(matched_filter, x, y),
+        threshold)` gives there.
+
+        The search within a part of the trace goes tile by tile, and the lines found within a tile are kept
+        until the threshold changes, so when the part moves, only the tiles not searched yet get searched.
+        """
+        if self.x.size < 2 or self.y.size < 2:
+            return np.empty(0, dtype=np.intp)
+        std: np.ndarray = self.std
+        level: float = self.level(threshold)
+        if np.isnan(level):
+            return np.empty(0, dtype=np.intp)
+        lower = max(lower, 0)
+        upper = std.size if upper is None else min(upper, std.size)
+        if lower == 0 and upper == std.size:
+            return peaks_above(self.correlation, std, level)
+        if lower >= upper:
+            return np.empty(0, dtype=np.intp)
+        first_tile: int = lower // TILE_SIZE
+        last_tile: int = -(-upper // TILE_SIZE)
+        with self._lock:
+            if level != self._tiles_level:
+                self._tiles = dict()
+                self._tiles_level = level
+            tile: int = first_tile
+            while tile < last_tile:
+                if tile in self._tiles:
+                    tile += 1
+                    continue
+                # search the adjacent tiles not searched yet at once
+                next_tile: int = tile + 1
+                while next_tile < last_tile and next_tile not in self._tiles:
+                    next_tile += 1
+                peaks: np.ndarray = self._peaks_near(level, tile * TILE_SIZE, min(next_tile * TILE_SIZE, std.size))
+                bounds: np.ndarray = np.searchsorted(peaks, np.arange(tile, next_tile + 1) * TILE_SIZE)
+                for index in range(next_tile - tile):
+                    self._tiles[tile + index] = peaks[bounds[index]:bounds[index + 1]]
+                tile = next_tile
+            found: np.ndarray = np.concatenate([self._tiles[tile] for tile in range(first_tile, last_tile)])
+        return found[(found >= lower) & (found < upper)]
 
 
 if __name__ == '__main__':
     def main():
-        """ try and error function """
-        from matplotlib import pyplot as plt
-
-        # data: np.ndarray = np.loadtxt('lines.csv')
-
-        # f: np.ndarray = np.arange(118000.0, 118150.0, 0.1)
-        # v: np.ndarray = np.random.normal(size=(f.size,))
-        # model: np.ndarray = np.loadtxt('averaged fs signal.csv')
-        # data: np.ndarray = np.column_stack((f, correlation(model, f, v)))
-        # plt.plot(f, v, label='initial')
-
-        f: np.ndarray = np.arange(118000.0, 175000.0, 0.1)
-        v: np.ndarray = np.loadtxt('mo4/030820/OCS2.frd', usecols=(0,)).ravel()
-        v -= np.median(v)
-        model = np.loadtxt('averaged fs signal filtered.csv')
-        plt.xlim(134198.5 - 10, 134198.5 + 10)
-        data: np.ndarray = correlation(model, f, v)
-        plt.plot(f, v, label='initial')
-
-        found_lines = peaks_positions(f, data)
-        if found_lines.size:
-            print(f'found {found_lines.size} lines:')
-            for ff, fd in zip(f[found_lines], v[found_lines]):
-                print(f'{ff:.3f}\t{-fd:.6f}')
-            plt.plot(f[found_lines], v[found_lines], ls='', marker='o')
-        plt.tight_layout()
-        plt.legend(loc='upper left')
-        plt.grid()
-        plt.show()
+        """ time the stages of the detection on synthetic sweeps, and check what gets detected against the truth """
+        from timeit import timeit
+
+        frequency_step: float = 0.1
+        frame_size: float = 50.0
+        model: np.ndarray = np.loadtxt('averaged fs signal filtered.csv')
+        templates: TemplateCache = TemplateCache(model)
+        matched_filter: MatchedFilter = templates.matched_filter(frequency_step)
+        bank: FilterBank = templates.filter_bank(frequency_step, TEMPLATE_WIDTHS)
+        rng: np.random.Generator = np.random.default_rng(0)
+
+        def synthetic_sweep(size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            """
+            Make a sweep of unit noise with lines of the model shape stretched 0.7 to 1.4 times,
+            on a drifting baseline that jumps at the edges of the frames.
+
+            :return: the frequencies, the voltages, and the ascending indices of the line centers
+            """
+            x: np.ndarray = 118000.0 + np.arange(size) * frequency_step
+            y: np.ndarray = rng.normal(size=size)
+            y += 40.0 * np.sin(np.linspace(0.0, 3.0 * np.pi, size)) + np.linspace(-20.0, 20.0, size)
+            frame_points: int = round(frame_size / frequency_step)
+            y += np.repeat(rng.normal(scale=2.0, size=-(-size // frame_points)), frame_points)[:size]
+            # a line every 500 MHz or so, never overlapping another one or crossing the edges
+            lines_count: int = max(1, size // 5000)
+            centers: np.ndarray = np.sort(rng.choice(np.arange(1, size // 1000), lines_count, replace=False)) * 1000
+            centers += rng.integers(-200, 200, centers.size)
+            center: int
+            for center in centers:
+                kernel: np.ndarray = templates._kernel(frequency_step, rng.uniform(0.7, 1.4))
+                start: int = center - kernel.size // 2
+                y[start:start + kernel.size] += rng.uniform(2.0, 10.0) * kernel
+            return x, y, centers
+
+        def scores(found: np.ndarray, truth: np.ndarray, tolerance: int) -> Tuple[float, float]:
+            """ the recall and the precision of the lines found, those within `tolerance` points counted as true """
+            def matched(items: np.ndarray, targets: np.ndarray) -> np.ndarray:
+                if not targets.size:
+                    return np.zeros(items.size, dtype=np.bool_)
+                indices: np.ndarray = np.clip(np.searchsorted(targets, items), 1, targets.size - 1)
+                distances: np.ndarray = np.minimum(np.abs(items - targets[indices - 1]),
+                                                   np.abs(items - targets[indices]))
+                return distances <= tolerance
+
+            return (float(np.mean(matched(truth, found))) if truth.size else 1.0,
+                    float(np.mean(matched(found, truth))) if found.size else 1.0)
+
+        # the equivalence checks of the fast implementations
+        from scipy import ndimage
+        import pandas as pd
+
+        for _ in range(1000):
+            mask: np.ndarray = rng.random(rng.integers(1, 300)) < rng.random()
+            expected: np.ndarray = ndimage.binary_dilation(ndimage.binary_erosion(
+                ndimage.binary_dilation(mask, iterations=SPIKES_ITERATIONS), iterations=SPIKES_ITERATIONS + 1))
+            if not np.array_equal(remove_spikes(mask, SPIKES_ITERATIONS), expected):
+                raise AssertionError('remove_spikes result differs from the scipy.ndimage one')
+        for _ in range(200):
+            kernels: List[np.ndarray] = [rng.normal(size=rng.integers(1, 400)) for _ in range(rng.integers(1, 4))]
+            signal: np.ndarray = rng.normal(size=rng.integers(1, 20000))
+
+            def reference(kernel: np.ndarray) -> np.ndarray:
+                """ the result for `kernel[kernel.size // 2]` at every point of the signal, whatever the sizes """
+                start: int = kernel.size - 1 - kernel.size // 2
+                return np.correlate(signal, kernel, 'full')[start:start + signal.size]
+
+            def close(actual: np.ndarray, expected: np.ndarray, kernel: np.ndarray) -> bool:
+                return actual.shape == expected.shape and np.allclose(
+                    actual, expected, rtol=0.0, atol=1e-9 * np.sum(np.abs(kernel)) * np.max(np.abs(signal)))
+
+            kernel: np.ndarray
+            for kernel in kernels:
+                expected: np.ndarray = np.correlate(signal, kernel, 'same')
+                method: str
+                for method in ('direct', 'fft'):
+                    if not close(MatchedFilter(kernel).correlate(signal, method=method), expected, kernel):
+                        raise AssertionError(f'MatchedFilter {method} result differs from the np.correlate one '
+                                             f'for {kernel.size} and {signal.size} points')
+                if signal.size >= kernel.size and not close(reference(kernel), expected, kernel):
+                    raise AssertionError('np.correlate puts its results not where expected')
+            correlations: List[np.ndarray] = list(FilterBank(kernels).correlate(signal))
+            if len(correlations) != len(kernels) \
+                    or not all(close(c, reference(k), k) for c, k in zip(correlations, kernels)):
+                raise AssertionError(f'FilterBank result differs from the np.correlate one '
+                                     f'for {[k.size for k in kernels]} and {signal.size} points')
+        data: np.ndarray = rng.normal(size=100000) + 1000.0
+        data[rng.integers(0, data.size, 50)] = np.nan
+        if not np.allclose(rolling_std(data, 26), pd.Series(data).rolling(26, center=True).std().to_numpy(),
+                           equal_nan=True):
+            raise AssertionError('rolling_std result differs from the pandas one')
+
+        window: int = round(LINE_WIDTH / frequency_step)
+        threshold: float = 1.0 / 200.0
+        repeat: int = 3
+        print(f'numpy {np.__version__}, {os.cpu_count()} CPU(s), model of {matched_filter.kernel.size} points, '
+              f'{repeat} runs each')
+        print('points\tprefilter\tcorrelate\tnormalize\trolling std\tquantile\tpeaks\tdetector\tparallel\t'
+              'lines\tfound\trecall\tprecision\tbank\tfound\trecall\tprecision')
+        size: int
+        for size in (10000, 100000, 1000000, 5000000):
+            x, y, truth = synthetic_sweep(size)
+            prefiltered: np.ndarray = _prefiltered(x, y)
+            raw: np.ndarray = matched_filter.correlate(prefiltered)
+            data = _normalize(raw.copy())
+            std: np.ndarray = rolling_std(data, window)
+            level: float = np.nanquantile(std, 1.0 - threshold)
+            found: np.ndarray = peaks_positions(x, correlation(matched_filter, x, y), threshold)
+
+            # what gets detected must not depend on the way it's detected
+            detector: LineDetector = LineDetector(x, y, matched_filter, parallel=True)
+            if not np.array_equal(detector.find(threshold), found):
+                raise AssertionError(f'LineDetector result differs from peaks_positions one for {size} points')
+            if not np.array_equal(detector.find(threshold, size // 3, size // 2),
+                                  found[(found >= size // 3) & (found < size // 2)]):
+                raise AssertionError(f'LineDetector result within a range differs for {size} points')
+
+            times: List[float] = [
+                timeit(lambda: _prefiltered(x, y), number=repeat),
+                timeit(lambda: matched_filter.correlate(prefiltered), number=repeat),
+                timeit(lambda: _normalize(raw.copy()), number=repeat),
+                timeit(lambda: rolling_std(data, window), number=repeat),
+                timeit(lambda: np.nanquantile(std, 1.0 - threshold), number=repeat),
+                timeit(lambda: peaks_above(data, std, level), number=repeat),
+                timeit(lambda: LineDetector(x, y, matched_filter).find(threshold), number=repeat),
+                timeit(lambda: LineDetector(x, y, matched_filter, parallel=True).find(threshold), number=repeat),
+            ]
+            recall: float
+            precision: float
+            recall, precision = scores(found, truth, window)
+            found_by_bank: np.ndarray = LineDetector(x, y, bank, parallel=True).find(threshold)
+            bank_recall: float
+            bank_precision: float
+            bank_recall, bank_precision = scores(found_by_bank, truth, window)
+            t_bank: float = timeit(lambda: LineDetector(x, y, bank, parallel=True).find(threshold), number=repeat)
+            print('\t'.join([str(size)] + [f'{t / repeat * 1e3:.1f} ms' for t in times]
+                            + [str(truth.size), str(found.size), f'{recall:.3f}', f'{precision:.3f}',
+                               f'{t_bank / repeat * 1e3:.1f} ms', str(found_by_bank.size),
+                               f'{bank_recall:.3f}', f'{bank_precision:.3f}']))
 
 
     main()
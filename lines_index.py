@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+
+class LinesIndex:
+    """
+    The lines found in several traces, kept in a single table sorted by frequency.
+
+    For every line, there are the frequency, the voltage, the detection score, the width of the template
+    matched best relative to the model, the index of the trace, and the index of the point within the trace.
+    The lines of a trace are replaced all at once in O(N), and the lines near a frequency are found in O(log N).
+    """
+
+    def __init__(self):
+        self.frequencies: np.ndarray = np.empty(0)
+        self.voltages: np.ndarray = np.empty(0)
+        self.scores: np.ndarray = np.empty(0)
+        self.widths: np.ndarray = np.empty(0)
+        self.traces: np.ndarray = np.empty(0, dtype=np.intp)
+        self.points: np.ndarray = np.empty(0, dtype=np.intp)
+
+    def __len__(self) -> int:
+        return self.frequencies.size
+
+    def _keep(self, kept: Union[np.ndarray, slice]):
+        self.frequencies = self.frequencies[kept]
+        self.voltages = self.voltages[kept]
+        self.scores = self.scores[kept]
+        self.widths = self.widths[kept]
+        self.traces = self.traces[kept]
+        self.points = self.points[kept]
+
+    def clear(self):
+        self._keep(slice(0, 0))
+
+    def set_trace(self, trace: int, points: np.ndarray,
+                  frequencies: np.ndarray, voltages: np.ndarray, scores: np.ndarray, widths: np.ndarray):
+        """
+        Replace the lines of a trace.
+
+        :param trace: the index of the trace
+        :param points: the indices of the points of the lines within the trace
+        :param frequencies: the ascending frequencies of the lines
+        :param voltages: the voltages of the lines
+        :param scores: the detection scores of the lines
+        :param widths: the widths of the templates matched best relative to the model
+        """
+        self._keep(self.traces != trace)
+        # the lines of the same frequency go in the order of the traces they are added in
+        positions: np.ndarray = np.searchsorted(self.frequencies, frequencies, side='right')
+        self.frequencies = np.insert(self.frequencies, positions, frequencies)
+        self.voltages = np.insert(self.voltages, positions, voltages)
+        self.scores = np.insert(self.scores, positions, scores)
+        self.widths = np.insert(self.widths, positions, widths)
+        self.traces = np.insert(self.traces, positions, trace)
+        self.points = np.insert(self.points, positions, points)
+
+    def pop_trace(self, trace: int):
+        """ remove the lines of a trace, and move the lines of the following traces one trace back """
+        self._keep(self.traces != trace)
+        self.traces[self.traces > trace] -= 1
+
+    def trace_lines(self, trace: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ the points, the frequencies, and the voltages of the lines of a trace, ascending """
+        of_trace: np.ndarray = self.traces == trace
+        return self.points[of_trace], self.frequencies[of_trace], self.voltages[of_trace]
+
+    def nearest(self, frequency: float) -> int:
+        """ the index of the line closest to `frequency` """
+        if not self.frequencies.size:
+            raise IndexError('no lines found')
+        index: int = int(np.searchsorted(self.frequencies, frequency))
+        if index == self.frequencies.size \
+                or (index > 0 and frequency - self.frequencies[index - 1] <= self.frequencies[index] - frequency):
+            return index - 1
+        return index
+
+    def previous(self, frequency: float, tolerance: float = 0.0) -> Optional[int]:
+        """ the index of the closest line below `frequency - tolerance`, `None` if there is none """
+        index: int = int(np.searchsorted(self.frequencies, frequency - tolerance, side='left'))
+        return index - 1 if index else None
+
+    def next(self, frequency: float, tolerance: float = 0.0) -> Optional[int]:
+        """ the index of the closest line above `frequency + tolerance`, `None` if there is none """
+        index: int = int(np.searchsorted(self.frequencies, frequency + tolerance, side='right'))
+        return index if index < self.frequencies.size else None
+
+    def index_range(self, lower: Optional[float] = None, upper: Optional[float] = None) -> Tuple[int, int]:
+        """ the indices of the lines within `[lower, upper]`, as `slice` arguments; `None` means no limit """
+        return (0 if lower is None else int(np.searchsorted(self.frequencies, lower, side='left')),
+                self.frequencies.size if upper is None else int(np.searchsorted(self.frequencies, upper, side='right')))
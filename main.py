@@ -124,10 +124,12 @@ class App(QMainWindow):
         self.spin_threshold = QDoubleSpinBox(self.group_find_lines)
         self.spin_threshold.setMinimum(1.0)
         self.spin_threshold.setMaximum(1000.0)
+        self.check_find_lines_in_view = QCheckBox(self.group_find_lines)
         self.button_find_lines = QPushButton(self.group_find_lines)
         self.button_clear_lines = QPushButton(self.group_find_lines)
         self.button_prev_line = QPushButton(self.group_find_lines)
         self.button_next_line = QPushButton(self.group_find_lines)
+        self.button_mark_lines = QPushButton(self.group_find_lines)
 
         # plot
         self.figure = Figure()
@@ -178,12 +180,14 @@ class App(QMainWindow):
         self.button_mark_max_reset.clicked.connect(self.button_mark_max_reset_clicked)
         self.button_zoom_to_selection.clicked.connect(self.button_zoom_to_selection_clicked)
 
-        self.spin_threshold.valueChanged.connect(lambda new_value:
-                                                 self.set_config_value('lineSearch', 'threshold', new_value))
-        self.button_find_lines.clicked.connect(lambda: self.plot.find_lines(self.spin_threshold.value()))
+        self.spin_threshold.valueChanged.connect(self.spin_threshold_changed)
+        self.check_find_lines_in_view.toggled.connect(self.check_find_lines_in_view_toggled)
+        self.button_find_lines.clicked.connect(lambda: self.plot.find_lines(self.spin_threshold.value(),
+                                                                            self.check_find_lines_in_view.isChecked()))
         self.button_clear_lines.clicked.connect(self.plot.clear_lines)
         self.button_prev_line.clicked.connect(self.prev_found_line)
         self.button_next_line.clicked.connect(self.next_found_line)
+        self.button_mark_lines.clicked.connect(self.plot.mark_found_lines)
 
         self.mpl_connect_cid = self.canvas.mpl_connect('button_press_event', self.plot_on_click)
 
@@ -232,10 +236,12 @@ class App(QMainWindow):
 
         self.grid_layout_find_lines.addWidget(self.label_threshold, 0, 0)
         self.grid_layout_find_lines.addWidget(self.spin_threshold, 0, 1)
-        self.grid_layout_find_lines.addWidget(self.button_find_lines, 1, 0, 1, 2)
-        self.grid_layout_find_lines.addWidget(self.button_clear_lines, 2, 0, 1, 2)
-        self.grid_layout_find_lines.addWidget(self.button_prev_line, 3, 0)
-        self.grid_layout_find_lines.addWidget(self.button_next_line, 3, 1)
+        self.grid_layout_find_lines.addWidget(self.check_find_lines_in_view, 1, 0, 1, 2)
+        self.grid_layout_find_lines.addWidget(self.button_find_lines, 2, 0, 1, 2)
+        self.grid_layout_find_lines.addWidget(self.button_clear_lines, 3, 0, 1, 2)
+        self.grid_layout_find_lines.addWidget(self.button_prev_line, 4, 0)
+        self.grid_layout_find_lines.addWidget(self.button_next_line, 4, 1)
+        self.grid_layout_find_lines.addWidget(self.button_mark_lines, 5, 0, 1, 2)
 
         _value_label_interaction_flags = (Qt.LinksAccessibleByKeyboard
                                           | Qt.LinksAccessibleByMouse
@@ -306,10 +312,16 @@ class App(QMainWindow):
         self.group_find_lines.setToolTip(_translate('main window',
                                                     'Try to detect lines automatically'))
         self.label_threshold.setText(_translate('main window', 'Search threshold') + ':')
+        self.check_find_lines_in_view.setText(_translate('main window', 'Only within the view'))
+        self.check_find_lines_in_view.setToolTip(_translate('main window',
+                                                            'Look for lines only within the visible part '
+                                                            'of the marked range, and keep looking as it moves'))
         self.button_find_lines.setText(_translate('main window', 'Find Lines'))
         self.button_clear_lines.setText(_translate('main window', 'Clear Lines'))
         self.button_prev_line.setText(_translate('main window', 'Previous Line'))
         self.button_next_line.setText(_translate('main window', 'Next Line'))
+        self.button_mark_lines.setText(_translate('main window', 'Mark Lines'))
+        self.button_mark_lines.setToolTip(_translate('main window', 'Mark the lines found within the selection'))
 
         self.spin_frequency_min.setSuffix(suffix_mhz)
         self.spin_frequency_max.setSuffix(suffix_mhz)
@@ -383,6 +395,7 @@ class App(QMainWindow):
         self.check_voltage_persists.setChecked(self.get_config_value('voltage', 'persists', False, bool))
 
         self.spin_threshold.setValue(self.get_config_value('lineSearch', 'threshold', 200.0, float))
+        self.check_find_lines_in_view.setChecked(self.get_config_value('lineSearch', 'inView', False, bool))
 
         self._loading = False
         return
@@ -412,10 +425,6 @@ class App(QMainWindow):
             return
         if limits is not None:
             min_freq, max_freq, min_voltage, max_voltage = limits
-            self.set_config_value('frequency', 'lower', min_freq)
-            self.set_config_value('frequency', 'upper', max_freq)
-            self.set_config_value('voltage', 'lower', min_voltage)
-            self.set_config_value('voltage', 'upper', max_voltage)
             self._loading = True
             if not self.check_frequency_persists.isChecked():
                 self.spin_frequency_min.setValue(min_freq)
@@ -447,7 +456,6 @@ class App(QMainWindow):
     def spin_frequency_min_changed(self, new_value):
         if self._loading:
             return
-        self.set_config_value('frequency', 'lower', new_value)
         self._loading = True
         self.spin_frequency_max.setMinimum(new_value)
         self.spin_frequency_center.setValue(0.5 * (new_value + self.spin_frequency_max.value()))
@@ -458,7 +466,6 @@ class App(QMainWindow):
     def spin_frequency_max_changed(self, new_value):
         if self._loading:
             return
-        self.set_config_value('frequency', 'upper', new_value)
         self._loading = True
         self.spin_frequency_min.setMaximum(new_value)
         self.spin_frequency_center.setValue(0.5 * (self.spin_frequency_min.value() + new_value))
@@ -473,8 +480,6 @@ class App(QMainWindow):
         min_freq = new_value - 0.5 * freq_span
         max_freq = new_value + 0.5 * freq_span
         self._loading = True
-        self.set_config_value('frequency', 'lower', min_freq)
-        self.set_config_value('frequency', 'upper', max_freq)
         self.spin_frequency_min.setMaximum(max_freq)
         self.spin_frequency_max.setMinimum(min_freq)
         self.spin_frequency_min.setValue(min_freq)
@@ -489,8 +494,6 @@ class App(QMainWindow):
         min_freq = freq_center - 0.5 * new_value
         max_freq = freq_center + 0.5 * new_value
         self._loading = True
-        self.set_config_value('frequency', 'lower', min_freq)
-        self.set_config_value('frequency', 'upper', max_freq)
         self.spin_frequency_min.setMaximum(max_freq)
         self.spin_frequency_max.setMinimum(min_freq)
         self.spin_frequency_min.setValue(min_freq)
@@ -506,8 +509,6 @@ class App(QMainWindow):
         min_freq = freq_center - 0.5 * freq_span
         max_freq = freq_center + 0.5 * freq_span
         self._loading = True
-        self.set_config_value('frequency', 'lower', min_freq)
-        self.set_config_value('frequency', 'upper', max_freq)
         self.spin_frequency_min.setMaximum(max_freq)
         self.spin_frequency_max.setMinimum(min_freq)
         self.spin_frequency_min.setValue(min_freq)
@@ -524,8 +525,6 @@ class App(QMainWindow):
         min_freq = freq_center - 0.5 * freq_span
         max_freq = freq_center + 0.5 * freq_span
         self._loading = True
-        self.set_config_value('frequency', 'lower', min_freq)
-        self.set_config_value('frequency', 'upper', max_freq)
         self.spin_frequency_min.setMaximum(max_freq)
         self.spin_frequency_max.setMinimum(min_freq)
         self.spin_frequency_min.setValue(min_freq)
@@ -542,7 +541,6 @@ class App(QMainWindow):
     def spin_voltage_min_changed(self, new_value):
         if self._loading:
             return
-        self.set_config_value('voltage', 'lower', new_value)
         self._loading = True
         self.spin_voltage_max.setMinimum(new_value)
         self.plot.set_voltage_range(lower_value=new_value)
@@ -551,7 +549,6 @@ class App(QMainWindow):
     def spin_voltage_max_changed(self, new_value):
         if self._loading:
             return
-        self.set_config_value('voltage', 'upper', new_value)
         self._loading = True
         self.spin_voltage_min.setMaximum(new_value)
         self.plot.set_voltage_range(upper_value=new_value)
@@ -567,8 +564,6 @@ class App(QMainWindow):
         min_voltage = voltage_center - 0.5 * voltage_span
         max_voltage = voltage_center + 0.5 * voltage_span
         self._loading = True
-        self.set_config_value('voltage', 'lower', min_voltage)
-        self.set_config_value('voltage', 'upper', max_voltage)
         self.spin_voltage_min.setMaximum(max_voltage)
         self.spin_voltage_max.setMinimum(min_voltage)
         self.spin_voltage_min.setValue(min_voltage)
@@ -607,11 +602,30 @@ class App(QMainWindow):
         self.spin_frequency_min.setValue(self.spin_mark_min.value())
         self.spin_frequency_max.setValue(self.spin_mark_max.value())
 
+    def spin_threshold_changed(self, new_value):
+        self.set_config_value('lineSearch', 'threshold', new_value)
+        if self.plot.lines_found:
+            # only the last stages of the detection are run again, so it's fast enough to follow the spin box
+            self.plot.find_lines(new_value, in_view=self.check_find_lines_in_view.isChecked())
+
+    def check_find_lines_in_view_toggled(self, new_value):
+        if self._loading:
+            return
+        self.set_config_value('lineSearch', 'inView', new_value)
+        if self.plot.lines_found:
+            self.plot.find_lines(self.spin_threshold.value(), in_view=new_value)
+
+    def _frequency_center_tolerance(self) -> float:
+        """ the half of the precision of the center spin box, for its value to match a line within it """
+        return 0.5 * 10.0 ** -self.spin_frequency_center.decimals()
+
     def prev_found_line(self):
-        self.spin_frequency_center.setValue(self.plot.prev_found_line(self.spin_frequency_center.value()))
+        self.spin_frequency_center.setValue(self.plot.prev_found_line(self.spin_frequency_center.value(),
+                                                                      self._frequency_center_tolerance()))
 
     def next_found_line(self):
-        self.spin_frequency_center.setValue(self.plot.next_found_line(self.spin_frequency_center.value()))
+        self.spin_frequency_center.setValue(self.plot.next_found_line(self.spin_frequency_center.value(),
+                                                                      self._frequency_center_tolerance()))
 
     def plot_on_click(self, event):
         if self._loading:
@@ -622,10 +636,6 @@ class App(QMainWindow):
                     and not self.plot.trace_mode \
                     and not self.plot.trace_multiple_mode:
                 min_freq, max_freq, min_voltage, max_voltage = self.plot.on_double_click(event)
-                self.set_config_value('frequency', 'lower', min_freq)
-                self.set_config_value('frequency', 'upper', max_freq)
-                self.set_config_value('voltage', 'lower', min_voltage)
-                self.set_config_value('voltage', 'upper', max_voltage)
                 self._loading = True
                 self.spin_frequency_min.setValue(min_freq)
                 self.spin_frequency_max.setValue(max_freq)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class MarkedPoints:
+    """
+    The points marked on the traces, kept as columns in the order they are marked in.
+
+    For every point, there are a key to find the point by, e.g., the number of its annotation,
+    the frequency, the voltage, the mean voltage around, and the index of the label of the trace in `labels`.
+    Points are added and removed by key in bulk in O(N),
+    and the points within a rectangle are found in O(log N) via an index sorted by frequency.
+    """
+
+    def __init__(self):
+        self.keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self.frequencies: np.ndarray = np.empty(0)
+        self.voltages: np.ndarray = np.empty(0)
+        self.offsets: np.ndarray = np.empty(0)
+        self.traces: np.ndarray = np.empty(0, dtype=np.intp)
+        self.labels: List[str] = []
+        # the rows sorted by frequency and the frequencies in that order, made when needed
+        self._order: Optional[np.ndarray] = None
+        self._sorted_frequencies: np.ndarray = np.empty(0)
+
+    def __len__(self) -> int:
+        return self.keys.size
+
+    def _keep(self, kept: Union[np.ndarray, slice]):
+        self.keys = self.keys[kept]
+        self.frequencies = self.frequencies[kept]
+        self.voltages = self.voltages[kept]
+        self.offsets = self.offsets[kept]
+        self.traces = self.traces[kept]
+        self._order = None
+
+    def clear(self):
+        self._keep(slice(0, 0))
+        self.labels.clear()
+
+    def add(self, keys: Sequence[int],
+            frequencies: Sequence[float], voltages: Sequence[float], offsets: Sequence[float],
+            labels: Sequence[str]):
+        """
+        Add points after the ones there, replacing the points with the same keys.
+
+        :param keys: the keys of the points
+        :param frequencies: the frequencies of the points
+        :param voltages: the voltages of the points
+        :param offsets: the mean voltages around the points
+        :param labels: the labels of the traces the points are on
+        """
+        self.remove(keys)
+        label: str
+        for label in labels:
+            if label not in self.labels:
+                self.labels.append(label)
+        self.keys = np.concatenate((self.keys, np.asarray(keys, dtype=np.int64)))
+        self.frequencies = np.concatenate((self.frequencies, np.asarray(frequencies, dtype=float)))
+        self.voltages = np.concatenate((self.voltages, np.asarray(voltages, dtype=float)))
+        self.offsets = np.concatenate((self.offsets, np.asarray(offsets, dtype=float)))
+        self.traces = np.concatenate((self.traces,
+                                      np.array([self.labels.index(label) for label in labels], dtype=np.intp)))
+        self._order = None
+
+    def remove(self, keys: Iterable[int]):
+        """ remove the points with the keys given, if any """
+        keys = np.fromiter(keys, dtype=np.int64)
+        if keys.size and self.keys.size:
+            self._keep(~np.isin(self.keys, keys))
+
+    def within(self, frequency_lower: float, frequency_upper: float,
+               voltage_lower: float, voltage_upper: float) -> np.ndarray:
+        """ the rows of the points within the rectangle, ascending """
+        if self._order is None:
+            self._order = np.argsort(self.frequencies, kind='stable')
+            self._sorted_frequencies = self.frequencies[self._order]
+        rows: np.ndarray = self._order[np.searchsorted(self._sorted_frequencies, frequency_lower, side='left'):
+                                       np.searchsorted(self._sorted_frequencies, frequency_upper, side='right')]
+        rows = rows[(self.voltages[rows] >= voltage_lower) & (self.voltages[rows] <= voltage_upper)]
+        return np.sort(rows)
+
+    def groups(self) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """ the frequencies, the voltages, and the voltages to the mean of the points by the trace label """
+        data: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = dict()
+        trace: int
+        for trace in dict.fromkeys(self.traces.tolist()):
+            of_trace: np.ndarray = self.traces == trace
+            data[self.labels[trace]] = (self.frequencies[of_trace], self.voltages[of_trace],
+                                        self.voltages[of_trace] - self.offsets[of_trace])
+        return data
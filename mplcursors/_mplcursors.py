@@ -89,7 +89,8 @@ class Cursor:
                  multiple=False,
                  bindings=None,
                  annotation_kwargs=None,
-                 annotation_positions=None):
+                 annotation_positions=None,
+                 move=None):
         """Construct a cursor.
 
         Parameters
@@ -135,11 +136,19 @@ class Cursor:
 
         annotation_positions : List[dict], optional
             List of positions tried by the annotation positioning algorithm.
+
+        move : callable, optional
+            A function called with the `Selection` to move and the key
+            (``"left"``, ``"right"``, ``"up"``, or ``"down"``), returning the
+            target to move to, in data coordinates, and its index, or ``None``
+            to stay.  By default, the points of the selected artist are
+            stepped through.
         """
 
         self._artists = artists
 
         self._multiple = multiple
+        self._move = move
 
         self._visible = True
         self._enabled = True
@@ -147,11 +156,14 @@ class Cursor:
         self._last_auto_position = None
         self._last_active_selection = -1
         self._callbacks = CallbackRegistry()
+        # The canvas contents without the annotation being moved, per canvas.
+        self._backgrounds = {}
 
         connect_pairs = [
             ('key_press_event', self._on_key_press),
             ('button_press_event', self._mouse_click_handler),
-            ('pick_event', self._pick_event_handler)
+            ('pick_event', self._pick_event_handler),
+            ('draw_event', self._on_draw),
         ]
         self._disconnectors = [
             partial(canvas.mpl_disconnect, canvas.mpl_connect(*pair))
@@ -221,9 +233,12 @@ class Cursor:
     @visible.setter
     def visible(self, value):
         self._visible = value
+        figures = set()
         for sel in self.selections:
             sel.annotation.set_visible(value)
-            sel.annotation.figure.canvas.draw_idle()
+            figures.add(sel.annotation.figure)
+        for figure in figures:
+            figure.canvas.draw_idle()
 
     def add_selection(self, pi):
         """Create an annotation for a `Selection` and register it.
@@ -239,6 +254,29 @@ class Cursor:
         Likewise, if the text alignment is not explicitly set but the position
         is, then a suitable alignment will be automatically computed.
         """
+        sel = self._annotate(pi)
+        figure = pi.artist.figure
+        ann = sel.annotation
+        if len(self.selections) > 1 and not self._multiple or not figure.canvas.supports_blit:
+            # Either:
+            #  - there may be more things to draw, or
+            #  - annotation removal will make a full redraw necessary, or
+            #  - blitting is not (yet) supported.
+            figure.canvas.draw_idle()
+        elif ann.axes:
+            # Fast path, only needed if the annotation has not been immediately removed.
+            figure.draw_artist(ann)
+            # Explicit argument needed on MacOSX backend.
+            figure.canvas.blit(figure.bbox)
+        # Removal comes after addition so that the fast blitting path works.
+        if not self._multiple:
+            self.remove_selections(self.selections[:-1])
+        self._last_active_selection = -1
+        return sel
+
+    def _annotate(self, pi):
+        """Create and place the annotation for a `Selection` and register it.
+        """
         # pi: "pick_info", i.e. an incomplete selection.
         # Pre-fetch the figure and axes, as callbacks may actually unset them.
         figure = pi.artist.figure
@@ -261,46 +299,112 @@ class Cursor:
         # Check that `ann.axes` is still set, as callbacks may have removed the
         # annotation.
         if ann.axes and ann.xyann == (np.nan, np.nan):
-            fig_bbox = figure.get_window_extent()
-            ax_bbox = axes.get_window_extent()
-            overlaps = []
-            for idx, annotation_position in enumerate(self.annotation_positions):
-                ann.set(**annotation_position)
-                # Work around matplotlib/matplotlib#7614: position update is missing.
+            self._auto_position(ann, figure, axes, renderer)
+        else:
+            self._auto_alignment(ann)
+        # The annotation may get blitted without a full redraw.
+        self._backgrounds.clear()
+        return sel
+
+    def _auto_position(self, ann, figure, axes, renderer):
+        """Place *ann* at the position overlapping the figure and the axes most.
+        """
+        fig_bbox = figure.get_window_extent()
+        ax_bbox = axes.get_window_extent()
+        if self._last_auto_position is not None:
+            # All the positions give boxes of the same size, so the last used
+            # position wins if the box fits within the axes and the figure.
+            ann.set(**self.annotation_positions[self._last_auto_position])
+            ann.update_positions(renderer)
+            bbox = ann.get_window_extent(renderer)
+            area = _get_rounded_intersection_area(bbox, bbox)
+            if (_get_rounded_intersection_area(fig_bbox, bbox) == area
+                    and _get_rounded_intersection_area(ax_bbox, bbox) == area):
+                return
+        overlaps = []
+        for idx, annotation_position in enumerate(self.annotation_positions):
+            ann.set(**annotation_position)
+            # Work around matplotlib/matplotlib#7614: position update is missing.
+            ann.update_positions(renderer)
+            bbox = ann.get_window_extent(renderer)
+            overlaps.append(
+                (_get_rounded_intersection_area(fig_bbox, bbox),
+                 _get_rounded_intersection_area(ax_bbox, bbox),
+                 # Avoid needlessly jumping around by breaking ties using
+                 # the last used position as default.
+                 idx == self._last_auto_position))
+        auto_position = max(range(len(overlaps)), key=getattr(overlaps, '__getitem__'))
+        ann.set(**self.annotation_positions[auto_position])
+        self._last_auto_position = auto_position
+
+    @staticmethod
+    def _auto_alignment(ann):
+        """Align *ann* away from its target unless the alignment has been set.
+        """
+        if isinstance(ann.get_ha(), _MarkedStr):
+            ann.set_ha({-1: "right", 0: "center", 1: "left"}[np.sign(np.nan_to_num(ann.xyann[0]))])
+        if isinstance(ann.get_va(), _MarkedStr):
+            ann.set_va({-1: "top", 0: "center", 1: "bottom"}[np.sign(np.nan_to_num(ann.xyann[1]))])
+
+    def _move_selection(self, sel, pi):
+        """Move a `Selection` to the target of *pi*, keeping its annotation.
+
+        Returns the moved `Selection`, which takes the place of *sel*.
+
+        The ``"remove"`` and ``"add"`` events are emitted as if *sel* were
+        removed and the new `Selection` were added.  Unless a callback sets
+        the position of the annotation, the annotation keeps the position it
+        had relative to the target, as long as it stays within the axes.
+        When blitting is supported, only the annotation gets redrawn.
+        """
+        ann = sel.annotation
+        figure = ann.figure
+        axes = ann.axes
+        index = self._selections.index(sel)
+        new_sel = getattr(pi, '_replace')(annotation=ann)
+        self._selections[index] = new_sel
+        self._last_active_selection = index
+        self._callbacks.process("remove", sel)
+
+        placement = dict(position=ann.xyann, ha=ann.get_ha(), va=ann.get_va())
+        ann.xy = pi.target
+        ann.set(text=_pick_info.get_ann_text(*pi),
+                position=(np.nan, np.nan), ha=_MarkedStr("center"), va=_MarkedStr("center"))
+        self._callbacks.process("add", new_sel)
+        if not ann.axes:
+            return new_sel
+        renderer = axes.get_renderer_cache()
+        if ann.xyann == (np.nan, np.nan):
+            ann.set(**placement)
+            if placement in self.annotation_positions:
                 ann.update_positions(renderer)
                 bbox = ann.get_window_extent(renderer)
-                overlaps.append(
-                    (_get_rounded_intersection_area(fig_bbox, bbox),
-                     _get_rounded_intersection_area(ax_bbox, bbox),
-                     # Avoid needlessly jumping around by breaking ties using
-                     # the last used position as default.
-                     idx == self._last_auto_position))
-            auto_position = max(range(len(overlaps)), key=getattr(overlaps, '__getitem__'))
-            ann.set(**self.annotation_positions[auto_position])
-            self._last_auto_position = auto_position
+                if (_get_rounded_intersection_area(axes.get_window_extent(), bbox)
+                        < _get_rounded_intersection_area(bbox, bbox)):
+                    self._auto_position(ann, figure, axes, renderer)
         else:
-            if isinstance(ann.get_ha(), _MarkedStr):
-                ann.set_ha({-1: "right", 0: "center", 1: "left"}[np.sign(np.nan_to_num(ann.xyann[0]))])
-            if isinstance(ann.get_va(), _MarkedStr):
-                ann.set_va({-1: "top", 0: "center", 1: "bottom"}[np.sign(np.nan_to_num(ann.xyann[1]))])
+            self._auto_alignment(ann)
+
+        canvas = figure.canvas
+        if not canvas.supports_blit:
+            canvas.draw_idle()
+            return new_sel
+        background = self._backgrounds.get(canvas)
+        if background is None:
+            visible = ann.get_visible()
+            ann.set_visible(False)
+            canvas.draw()
+            ann.set_visible(visible)
+            self._backgrounds[canvas] = canvas.copy_from_bbox(figure.bbox)
+        else:
+            canvas.restore_region(background)
+        figure.draw_artist(ann)
+        # Explicit argument needed on MacOSX backend.
+        canvas.blit(figure.bbox)
+        return new_sel
 
-        if len(self.selections) > 1 and not self._multiple or not figure.canvas.supports_blit:
-            # Either:
-            #  - there may be more things to draw, or
-            #  - annotation removal will make a full redraw necessary, or
-            #  - blitting is not (yet) supported.
-            figure.canvas.draw_idle()
-        elif ann.axes:
-            # Fast path, only needed if the annotation has not been immediately removed.
-            figure.draw_artist(ann)
-            # Explicit argument needed on MacOSX backend.
-            figure.canvas.blit(figure.bbox)
-        # Removal comes after addition so that the fast blitting path works.
-        if not self._multiple:
-            for sel in self.selections[:-1]:
-                self.remove_selection(sel)
-        self._last_active_selection = -1
-        return sel
+    def _on_draw(self, event):
+        self._backgrounds.pop(event.canvas, None)
 
     def connect(self, event, func=None):
         """Connect a callback to a `Cursor` event; return the callback id.
@@ -349,8 +453,7 @@ class Cursor:
         """
         for disconnectors in self._disconnectors:
             disconnectors()
-        for sel in self.selections:
-            self.remove_selection(sel)
+        self.remove_selections(self.selections)
 
     def _mouse_click_handler(self, event):
         if event.name == "button_press_event" and self._enabled:
@@ -361,8 +464,10 @@ class Cursor:
 
     def _pick_event_handler(self, event):
         if event.name == "pick_event" and self._enabled:
+            # The annotations are picked, so compare them rather than the
+            # targets, which is much faster when there are many selections.
             for index, sel in enumerate(self._selections[::-1]):
-                if np.allclose(event.artist.xy, sel.target):
+                if sel.annotation is event.artist:
                     self._last_active_selection = len(self._selections) - index - 1
                     break
 
@@ -416,19 +521,37 @@ class Cursor:
             return
         for key in ["left", "right", "up", "down"]:
             if event.key == self.bindings[key]:
-                self.remove_selection(sel)
-                self.add_selection(_pick_info.move(*sel, key=key))
+                if self._move is None:
+                    pi = _pick_info.move(*sel, key=key)
+                else:
+                    moved = self._move(sel, key)
+                    pi = (None if moved is None else
+                          getattr(sel, '_replace')(target=_pick_info.with_attrs(moved[0], index=moved[1]), dist=0))
+                if pi is not None:
+                    self._move_selection(sel, pi)
                 break
 
     def remove_selection(self, sel):
         """Remove a `Selection`.
         """
-        self._selections.remove(sel)
+        self.remove_selections([sel])
+
+    def remove_selections(self, sels):
+        """Remove several `Selection`\\s at once, redrawing each figure once.
+        """
+        # Selections compare by identity, but are not hashable.
+        removed = {id(sel) for sel in sels}
+        if not removed:
+            return
+        self._selections = [sel for sel in self._selections if id(sel) not in removed]
+        self._backgrounds.clear()
         # <artist>.figure will be unset so we save them first.
-        figures = {artist.figure for artist in [sel.annotation]}
-        # ValueError is raised if the artist has already been removed.
-        with suppress(ValueError):
-            sel.annotation.remove()
-        self._callbacks.process("remove", sel)
+        figures = {sel.annotation.figure for sel in sels}
+        for sel in sels:
+            # ValueError is raised if the artist has already been removed.
+            with suppress(ValueError):
+                sel.annotation.remove()
+            self._callbacks.process("remove", sel)
         for figure in figures:
-            figure.canvas.draw_idle()
+            if figure is not None:
+                figure.canvas.draw_idle()
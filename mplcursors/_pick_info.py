@@ -161,6 +161,41 @@ def _compute_projection_pick(artist, path, xy):
         return Selection(artist, target, dmin, None, None)
 
 
+def _sorted_window(artist, data_xy, xy):
+    """Find the points of *artist* close enough to *xy* horizontally to be picked.
+
+    When the artist transform is separable and the x values are sorted,
+    ignoring nans, only the points within the pick radius in x are worth
+    transforming to screen coordinates.  Return the slice of *data_xy* where
+    they are, or ``None`` if that can't be told this way.
+    """
+    transform = artist.get_transform()
+    if not transform.is_separable or len(data_xy) < 2:
+        return None
+    x = data_xy[:, 0]
+    finite = ~np.isnan(x)
+    indices = None
+    if not finite.all():
+        indices = np.flatnonzero(finite)
+        x = x[indices]
+    if not (x[1:] >= x[:-1]).all():
+        return None
+    # A pixel more for the rounding.
+    radius = artist.get_pickradius() + 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bounds = transform.inverted().transform(
+            [[xy[0] - radius, xy[1]], [xy[0] + radius, xy[1]]])[:, 0]
+    if not np.isfinite(bounds).all():
+        return None
+    start = np.searchsorted(x, min(bounds), side="left")
+    stop = np.searchsorted(x, max(bounds), side="right")
+    if indices is not None:
+        if start >= stop:
+            return slice(0, 0)
+        start, stop = indices[start], indices[stop - 1] + 1
+    return slice(start, stop)
+
+
 def compute_pick(artist, event):
     # No need to call `line.contains` as we're going to redo the work anyways
     # (also see matplotlib/matplotlib#6645, though that's fixed in mpl2.1).
@@ -171,6 +206,11 @@ def compute_pick(artist, event):
     xy = np.array([event.x, event.y])
     data_xy = artist.get_xydata()
     sels = []
+    window = _sorted_window(artist, data_xy, xy)
+    offset = 0
+    if window is not None:
+        data_xy = data_xy[window]
+        offset = window.start
     ds = np.hypot(*(xy - artist.get_transform().transform(data_xy)).T)
     try:
         argmin = np.nanargmin(ds)
@@ -183,7 +223,7 @@ def compute_pick(artist, event):
         pass
     else:
         # More precise than transforming back.
-        target = with_attrs(artist.get_xydata()[argmin], index=argmin)
+        target = with_attrs(data_xy[argmin], index=offset + argmin)
         sels.append(Selection(artist, target, dmin, None, None))
     if not sels:
         return None
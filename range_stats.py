@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import bisect
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from compensated_sums import prefix_sums, shifted_values, variance
+
+
+class RangeStats:
+    """
+    The mean, the standard deviation, and the median of any range of a trace.
+
+    The mean and the deviation come from the prefix sums of the trace in O(1).
+    The sums are compensated, for the differences of two close sums not to lose the digits of a short range
+    far from the trace start. The sums of the squares are made on the first call of `std`.
+    The median comes from the sorted values of the range asked last, which are updated point by point
+    when the next range overlaps it, as it does when a cursor moves along the trace.
+    A range with a NaN in it gives NaN, the way `np.mean` and `np.median` do.
+    """
+
+    def __init__(self, y: np.ndarray):
+        self._y: np.ndarray = y
+        shifted: np.ndarray
+        self._nan_counts: Optional[np.ndarray]
+        self._shift: float
+        shifted, self._nan_counts, self._shift = shifted_values(y)
+        self._sums: np.ndarray
+        self._sums_errors: np.ndarray
+        self._sums, self._sums_errors = prefix_sums(shifted)
+        self._sums_squared: Optional[np.ndarray] = None
+        self._sums_squared_errors: Optional[np.ndarray] = None
+        self._sorted_range: Tuple[int, int] = (0, 0)
+        self._sorted: List[float] = []
+
+    @property
+    def nbytes(self) -> int:
+        """ the memory taken by the sums made so far """
+        return self._sums.nbytes + self._sums_errors.nbytes \
+            + (self._sums_squared.nbytes + self._sums_squared_errors.nbytes
+               if self._sums_squared is not None else 0) \
+            + (self._nan_counts.nbytes if self._nan_counts is not None else 0)
+
+    def _squares_sums(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ the prefix sums of the squares of the shifted trace, made once """
+        if self._sums_squared is None:
+            shifted: np.ndarray = shifted_values(self._y)[0]
+            self._sums_squared, self._sums_squared_errors = prefix_sums(np.square(shifted, out=shifted))
+        return self._sums_squared, self._sums_squared_errors
+
+    @staticmethod
+    def _range_sum(sums: np.ndarray, errors: np.ndarray, lower: int, upper: int) -> float:
+        return float(sums[upper] - sums[lower]) + float(errors[upper] - errors[lower])
+
+    def _clip(self, lower: int, upper: int) -> Tuple[int, int]:
+        lower = min(max(lower, 0), self._y.size)
+        return lower, min(max(upper, lower), self._y.size)
+
+    def _has_nan(self, lower: int, upper: int) -> bool:
+        return self._nan_counts is not None and self._nan_counts[upper] > self._nan_counts[lower]
+
+    def mean(self, lower: int, upper: int) -> float:
+        """ the mean of `y[lower:upper]`, NaN for an empty range """
+        lower, upper = self._clip(lower, upper)
+        if lower == upper or self._has_nan(lower, upper):
+            return np.nan
+        return self._range_sum(self._sums, self._sums_errors, lower, upper) / (upper - lower) + self._shift
+
+    def std(self, lower: int, upper: int, ddof: int = 0) -> float:
+        """ the standard deviation of `y[lower:upper]`, the same as `np.std` gives, NaN for a range too short """
+        lower, upper = self._clip(lower, upper)
+        count: int = upper - lower
+        if count <= ddof or self._has_nan(lower, upper):
+            return np.nan
+        return float(np.sqrt(variance(self._range_sum(self._sums, self._sums_errors, lower, upper),
+                                      self._range_sum(*self._squares_sums(), lower, upper), count, ddof)))
+
+    def median(self, lower: int, upper: int) -> float:
+        """ the median of `y[lower:upper]`, NaN for an empty range """
+        lower, upper = self._clip(lower, upper)
+        if lower == upper or self._has_nan(lower, upper):
+            return np.nan
+        sorted_lower: int
+        sorted_upper: int
+        sorted_lower, sorted_upper = self._sorted_range
+        if upper <= sorted_lower or lower >= sorted_upper \
+                or abs(lower - sorted_lower) + abs(upper - sorted_upper) >= upper - lower:
+            # sorting anew is faster than updating
+            self._sorted = np.sort(self._y[lower:upper]).tolist()
+        else:
+            value: float
+            for value in self._y[sorted_lower:lower]:
+                del self._sorted[bisect.bisect_left(self._sorted, value)]
+            for value in self._y[upper:sorted_upper]:
+                del self._sorted[bisect.bisect_left(self._sorted, value)]
+            for value in self._y[lower:sorted_lower]:
+                bisect.insort(self._sorted, value)
+            for value in self._y[sorted_upper:upper]:
+                bisect.insort(self._sorted, value)
+        self._sorted_range = (lower, upper)
+        middle: int = len(self._sorted) // 2
+        if len(self._sorted) % 2:
+            return float(self._sorted[middle])
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2.0
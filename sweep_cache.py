@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import suppress
+from typing import Any, Callable, Final, List, Optional, Tuple
+
+import numpy as np
+
+SIZE_LIMIT: Final[int] = 1 << 29
+CACHE_EXT: Final[str] = '.npy'
+# the number of bytes hashed between the progress reports
+HASH_CHUNK_SIZE: Final[int] = 1 << 24
+
+FileId = Tuple[str, int, int]
+
+
+def file_id(filename: str) -> FileId:
+    """ the absolute path, the size, and the modification time (in ns) of a file """
+    stat: os.stat_result = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+
+def _content_digest(filename: str, callback: Optional[Callable[[int, int], Any]] = None) -> str:
+    """
+    The hash of the file content.
+
+    :param filename: the name of the file to hash
+    :param callback: the function called with the number of bytes hashed and the file size after each chunk;
+                     an exception raised there interrupts the hashing
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as fin:
+        try:
+            with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                size: int = len(buffer)
+                with memoryview(buffer) as view:
+                    start: int
+                    for start in range(0, size, HASH_CHUNK_SIZE):
+                        h.update(view[start:start + HASH_CHUNK_SIZE])
+                        if callback is not None:
+                            callback(min(start + HASH_CHUNK_SIZE, size), size)
+        except ValueError:  # empty file can't be mapped
+            pass
+    return h.hexdigest()
+
+
+class SweepCache:
+    """
+    A persistent cache of the parsed sweeps.
+
+    The data are stored as `.npy` files named after the file path, size, modification time, and content hash,
+    so a changed file never hits a stale entry. On a hit, the data are memory-mapped instead of being parsed.
+    The least recently used entries get removed to keep the total size of the cache within `size_limit` bytes.
+    """
+
+    def __init__(self, directory: str, size_limit: int = SIZE_LIMIT):
+        self.directory: str = directory
+        self.size_limit: int = size_limit
+
+    def _cache_filename(self, filename: str, callback: Optional[Callable[[int, int], Any]] = None) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr(file_id(filename)).encode())
+        h.update(_content_digest(filename, callback).encode())
+        return os.path.join(self.directory, h.hexdigest() + CACHE_EXT)
+
+    def load(self, filename: str, loader: Callable[[str], np.ndarray],
+             callback: Optional[Callable[[int, int], Any]] = None) -> np.ndarray:
+        """
+        Get the data of `filename` from the cache, or get them with `loader` and cache them.
+
+        :param filename: the name of the data file
+        :param loader: the function to parse `filename` with on a cache miss
+        :param callback: the function called with the number of bytes hashed and the file size
+                         while the file content is hashed to find the cache entry;
+                         an exception raised there interrupts the loading
+        :return: the data, read-only if taken from the cache
+        """
+        cache_filename: str = self._cache_filename(filename, callback)
+        if os.path.exists(cache_filename):
+            try:
+                data: np.ndarray = np.load(cache_filename, mmap_mode='r')
+            except (OSError, ValueError):
+                with suppress(OSError):
+                    os.remove(cache_filename)
+            else:
+                with suppress(OSError):
+                    os.utime(cache_filename)  # mark as recently used
+                return data
+
+        data = loader(filename)
+        self._store(cache_filename, data)
+        return data
+
+    def _store(self, cache_filename: str, data: np.ndarray):
+        if self.size_limit <= 0 or data.nbytes > self.size_limit:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # write into a temporary file first so that no partial entry is ever seen
+            fd, temp_filename = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                np.save(fout, data)
+            os.replace(temp_filename, cache_filename)
+        except OSError:
+            with suppress(OSError):
+                os.remove(temp_filename)
+            return
+        self.evict()
+
+    def evict(self):
+        """ remove the least recently used entries while the cache is larger than `size_limit` """
+        entries: List[Tuple[int, int, str]] = []
+        with suppress(OSError):
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(CACHE_EXT):
+                        stat: os.stat_result = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size: int = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.size_limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:  # the file might be in use
+                continue
+            total_size -= size
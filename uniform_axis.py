@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import math
+from typing import Optional, Tuple, Type, Union
+
+import numpy as np
+
+
+class UniformAxis:
+    """
+    An ascending uniform grid `start + step * i` for `i` in `range(count)`, stored without the values.
+
+    It behaves like a read-only 1D array where it's cheap: indexing with an integer gives a value,
+    slicing gives another `UniformAxis`. Indexing with an array and `np.asarray` produce the values.
+    The values are the same as `np.linspace(start, start + step * count, num=count, endpoint=False)` gives,
+    and a slice gives exactly the values the same slice of that array would have.
+    """
+
+    __slots__ = ('_origin', '_unit', '_offset', '_stride', 'count')
+
+    ndim: int = 1
+    dtype: Type = np.float64
+
+    def __init__(self, start: float = 0.0, step: float = 1.0, count: int = 0):
+        # the values are `_origin + _unit * (_offset + _stride * i)`, so that slicing doesn't change the rounding
+        self._origin: float = float(start)
+        self._unit: float = float(step)
+        self._offset: int = 0
+        self._stride: int = 1
+        self.count: int = int(count)
+
+    @classmethod
+    def from_range(cls, start: float, stop: float, count: int) -> 'UniformAxis':
+        """ the same grid as `np.linspace(start, stop, num=count, endpoint=False)` """
+        return cls(start, (stop - start) / count if count else 1.0, count)
+
+    @property
+    def start(self) -> float:
+        """ the first value """
+        return self._origin + self._unit * self._offset
+
+    @property
+    def step(self) -> float:
+        return self._unit * self._stride
+
+    @property
+    def stop(self) -> float:
+        """ the value next to the last one """
+        return self._origin + self._unit * (self._offset + self._stride * self.count)
+
+    @property
+    def size(self) -> int:
+        return self.count
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return self.count,
+
+    @property
+    def nbytes(self) -> int:
+        return 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(start={self.start!r}, step={self.step!r}, count={self.count!r})'
+
+    def _values(self, indices: np.ndarray) -> np.ndarray:
+        if self._stride != 1 or self._offset:
+            indices = indices * self._stride + self._offset
+        return indices * self._unit + self._origin
+
+    def __array__(self, dtype: Optional[Type] = None, copy: Optional[bool] = None) -> np.ndarray:
+        values: np.ndarray = self._values(np.arange(self.count, dtype=np.float64))
+        if dtype is not None:
+            return values.astype(dtype, copy=False)
+        return values
+
+    def __getitem__(self, item: Union[int, slice, np.ndarray]) -> Union[float, 'UniformAxis', np.ndarray]:
+        if isinstance(item, slice):
+            first: int
+            last: int
+            stride: int
+            first, last, stride = item.indices(self.count)
+            if stride < 0:
+                return np.asarray(self)[item]
+            sliced: UniformAxis = UniformAxis(self._origin, self._unit, len(range(first, last, stride)))
+            sliced._offset = self._offset + self._stride * first
+            sliced._stride = self._stride * stride
+            return sliced
+        if isinstance(item, (int, np.integer)):
+            if item < 0:
+                item += self.count
+            if not 0 <= item < self.count:
+                raise IndexError(f'index {item} is out of bounds for axis 0 with size {self.count}')
+            return self._origin + self._unit * (self._offset + self._stride * item)
+        item = np.asarray(item)
+        if item.dtype == np.bool_:
+            item = np.flatnonzero(item)
+        elif item.size and (np.min(item) < -self.count or np.max(item) >= self.count):
+            raise IndexError(f'index is out of bounds for axis 0 with size {self.count}')
+        return self._values(np.where(item < 0, item + self.count, item).astype(np.float64))
+
+    def searchsorted(self, value: float, side: str = 'left') -> int:
+        """ the same as `np.searchsorted(np.asarray(self), value, side)` does, but in O(1) """
+        if math.isnan(value) or value == math.inf:
+            return self.count
+        if value == -math.inf:
+            return 0
+        index: int = min(max(math.ceil(((value - self._origin) / self._unit - self._offset) / self._stride), 0),
+                         self.count)
+        # fix the floating-point rounding at the edges
+        if side == 'left':
+            while index > 0 and self[index - 1] >= value:
+                index -= 1
+            while index < self.count and self[index] < value:
+                index += 1
+        else:
+            while index > 0 and self[index - 1] > value:
+                index -= 1
+            while index < self.count and self[index] <= value:
+                index += 1
+        return index
+
+    def index_range(self, lower: Optional[float] = None, upper: Optional[float] = None) -> Tuple[int, int]:
+        """ the indices of the values within `[lower, upper]`, as `slice` arguments; `None` means no limit """
+        return (0 if lower is None else self.searchsorted(lower, side='left'),
+                self.count if upper is None else self.searchsorted(upper, side='right'))
+
+    def nearest(self, value: float) -> int:
+        """ the index of the value closest to `value` """
+        if not self.count:
+            raise IndexError('the axis is empty')
+        if math.isinf(value):
+            return 0 if value < 0 else self.count - 1
+        return min(max(round(((value - self._origin) / self._unit - self._offset) / self._stride), 0), self.count - 1)
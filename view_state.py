@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from typing import Final, Optional, Tuple
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+Limits = Tuple[Optional[float], Optional[float]]
+
+
+class ViewState(QObject):
+    """
+    The axes limits and the marks of a plot, with the changes applied at most once per event loop iteration.
+
+    Setting a value only stores it. When the control returns to the event loop, `changed` is emitted once
+    with the flags of everything that has changed since, however many values have been set in between.
+    Setting a value to the one already there changes nothing.
+    """
+    XLIM: Final[int] = 1
+    YLIM: Final[int] = 2
+    MARKS: Final[int] = 4
+    LINES: Final[int] = 8  # the points drawn are to be recalculated, e.g., for the data have changed
+
+    changed: pyqtSignal = pyqtSignal(int)
+
+    def __init__(self, xlim: Limits, ylim: Limits, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.xlim: Limits = xlim
+        self.ylim: Limits = ylim
+        self.marks: Limits = (None, None)
+        self._changes: int = 0
+        self._timer: QTimer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.apply)
+
+    def invalidate(self, changes: int):
+        """ schedule `changed` to be emitted with `changes` among the flags """
+        self._changes |= changes
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def set_xlim(self, lower: Optional[float] = None, upper: Optional[float] = None):
+        """ set the horizontal limits; `None` keeps the limit as is """
+        xlim: Limits = (self.xlim[0] if lower is None else lower, self.xlim[1] if upper is None else upper)
+        if xlim != self.xlim:
+            self.xlim = xlim
+            self.invalidate(self.XLIM)
+
+    def set_ylim(self, lower: Optional[float] = None, upper: Optional[float] = None):
+        """ set the vertical limits; `None` keeps the limit as is """
+        ylim: Limits = (self.ylim[0] if lower is None else lower, self.ylim[1] if upper is None else upper)
+        if ylim != self.ylim:
+            self.ylim = ylim
+            self.invalidate(self.YLIM)
+
+    def set_marks(self, lower: Optional[float] = None, upper: Optional[float] = None):
+        """ set the marked range; `None` means no limit """
+        if (lower, upper) != self.marks:
+            self.marks = (lower, upper)
+            self.invalidate(self.MARKS)
+
+    def apply(self):
+        """ emit `changed` now if anything has changed """
+        self._timer.stop()
+        changes: int = self._changes
+        self._changes = 0
+        if changes:
+            self.changed.emit(changes)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+import os
+from concurrent.futures import Executor, Future, wait
+from threading import Lock
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+import decimation
+import detection
+import sweep_cache
+from range_stats import RangeStats
+from uniform_axis import UniformAxis
+
+
+def read_fmd(filename: str) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Read the frequency range from a `.fmd` file.
+
+    :param filename: the name of the file to read
+    :return: the start and the stop frequencies, `None` if missing
+    """
+    min_frequency: Optional[float] = None
+    max_frequency: Optional[float] = None
+    with open(filename, 'r') as fin:
+        line: str
+        for line in fin:
+            if line and not line.startswith('*'):
+                t = list(map(lambda w: w.strip(), line.split(':', maxsplit=1)))
+                if len(t) > 1:
+                    if t[0].lower() == 'FStart [GHz]'.lower():
+                        min_frequency = float(t[1])
+                    elif t[0].lower() == 'FStop [GHz]'.lower():
+                        max_frequency = float(t[1])
+    return min_frequency, max_frequency
+
+
+class Cancelled(Exception):
+    """ raised within a worker when it's asked to stop """
+
+
+class SweepData(NamedTuple):
+    file_id: sweep_cache.FileId
+    min_frequency: Optional[float]
+    max_frequency: Optional[float]
+    frequencies: UniformAxis
+    voltages: np.ndarray
+    pyramid: decimation.MinMaxPyramid
+    stats: RangeStats
+    min_voltage: float
+    max_voltage: float
+
+
+class SweepLoader(QThread):
+    """
+    Read a `.fmd`/`.frd` pair in a separate thread.
+
+    `progress` is emitted with the number of bytes hashed to find the cache entry and the file size,
+    then with zeros when the parsing and the indexing, which can't tell how far they are, begin.
+    Then either `loaded` is emitted with a `SweepData`, or `failed` with an error message.
+    Nothing is emitted after `requestInterruption` is called.
+    """
+    progress: pyqtSignal = pyqtSignal(int, int)
+    loaded: pyqtSignal = pyqtSignal(object)
+    failed: pyqtSignal = pyqtSignal(str)
+
+    def __init__(self, fn: str, cache: sweep_cache.SweepCache, *,
+                 min_frequency: Optional[float] = None, max_frequency: Optional[float] = None,
+                 parent: Optional[QObject] = None):
+        """
+        :param fn: the file name without extension
+        :param cache: the cache to take the parsed data from
+        :param min_frequency: the start frequency to use if the `.fmd` file lacks it
+        :param max_frequency: the stop frequency to use if the `.fmd` file lacks it
+        :param parent: the object to keep the thread alive while it's running
+        """
+        super().__init__(parent)
+        self.fn: str = fn
+        self.cache: sweep_cache.SweepCache = cache
+        self.min_frequency: Optional[float] = min_frequency
+        self.max_frequency: Optional[float] = max_frequency
+
+    def _check_cancelled(self):
+        if self.isInterruptionRequested():
+            raise Cancelled
+
+    def _report_progress(self, done: int, total: int):
+        self._check_cancelled()
+        self.progress.emit(done, total)
+
+    def _parse(self, filename: str) -> np.ndarray:
+        self._report_progress(0, 0)
+        if not os.path.getsize(filename):
+            return np.empty(0)
+        # the `.frd` files are parsed as fast by `np.loadtxt` as by a custom parser
+        return np.loadtxt(filename, usecols=(0,), ndmin=1)
+
+    def run(self):
+        try:
+            file_id: sweep_cache.FileId = sweep_cache.file_id(self.fn + '.frd')
+            min_frequency: Optional[float]
+            max_frequency: Optional[float]
+            min_frequency, max_frequency = read_fmd(self.fn + '.fmd')
+            if min_frequency is None:
+                min_frequency = self.min_frequency
+            if max_frequency is None:
+                max_frequency = self.max_frequency
+            voltages: np.ndarray = self.cache.load(self.fn + '.frd', self._parse, callback=self._report_progress)
+            self._report_progress(0, 0)
+            frequencies: UniformAxis = UniformAxis.from_range(min_frequency, max_frequency, voltages.size)
+            self._check_cancelled()
+            pyramid: decimation.MinMaxPyramid = decimation.MinMaxPyramid(voltages)
+            self._check_cancelled()
+            stats: RangeStats = RangeStats(voltages)
+            self._check_cancelled()
+            min_voltage: float
+            max_voltage: float
+            min_voltage, max_voltage = pyramid.range_min_max(0, voltages.size)
+            data: SweepData = SweepData(file_id=file_id,
+                                        min_frequency=min_frequency, max_frequency=max_frequency,
+                                        frequencies=frequencies, voltages=voltages, pyramid=pyramid, stats=stats,
+                                        min_voltage=min_voltage, max_voltage=max_voltage)
+            self._check_cancelled()
+        except Cancelled:
+            return
+        except (OSError, ValueError, TypeError) as ex:
+            if not self.isInterruptionRequested():
+                self.failed.emit(str(ex))
+            return
+        self.loaded.emit(data)
+
+
+class LinesFinder(QObject):
+    """
+    Find lines in several traces in a shared pool of threads, one trace per task.
+
+    `found` is emitted with the trace index and the indices of the lines found as soon as a trace is done,
+    `progress` with the number of traces done and the number of traces, `failed` with an error message,
+    and `finished` when all the tasks are over, whether done or cancelled.
+    After `requestInterruption` is called, the tasks not started are cancelled, and the traces being processed
+    are finished, so that the detectors keep the stages done. `found` is still emitted for them, for their results
+    not to be lost, but neither `progress` nor `failed` is.
+    The pool is not shut down, so that it serves the next search.
+    """
+    found: pyqtSignal = pyqtSignal(int, object)
+    progress: pyqtSignal = pyqtSignal(int, int)
+    failed: pyqtSignal = pyqtSignal(str)
+    finished: pyqtSignal = pyqtSignal()
+
+    def __init__(self, detectors: Dict[int, detection.LineDetector], threshold: float, pool: Executor, *,
+                 regions: Optional[Dict[int, Tuple[int, int]]] = None,
+                 parent: Optional[QObject] = None):
+        """
+        :param detectors: the detectors of the traces by the trace index
+        :param threshold: the threshold to pass to `LineDetector.find`
+        :param pool: the executor to run the search in
+        :param regions: the index ranges to look for the lines within by the trace index, the whole traces if `None`
+        :param parent: the object to keep the finder alive while it's running
+        """
+        super().__init__(parent)
+        self.detectors: Dict[int, detection.LineDetector] = detectors
+        self.threshold: float = threshold
+        self.regions: Dict[int, Tuple[int, int]] = regions if regions is not None else dict()
+        self._pool: Executor = pool
+        self._futures: Dict[Future, int] = dict()
+        self._found: int = 0
+        self._over: int = 0
+        self._interrupted: bool = False
+        self._lock: Lock = Lock()
+
+    def start(self):
+        """ submit a task per trace to the pool """
+        if not self.detectors:
+            self.finished.emit()
+            return
+        self._futures = {self._pool.submit(detector.find, self.threshold, *self.regions.get(index, ())): index
+                         for index, detector in self.detectors.items()}
+        future: Future
+        for future in list(self._futures):
+            future.add_done_callback(self._on_task_done)
+
+    def requestInterruption(self):
+        """ cancel the tasks not started yet and stop reporting the progress and the errors """
+        with self._lock:
+            self._interrupted = True
+        future: Future
+        for future in list(self._futures):
+            future.cancel()
+
+    def isInterruptionRequested(self) -> bool:
+        with self._lock:
+            return self._interrupted
+
+    def wait(self):
+        """ block until the tasks are over """
+        wait(list(self._futures))
+
+    def _on_task_done(self, future: Future):
+        """ called in the thread that has run the task, or in the caller thread if the task is over already """
+        if not future.cancelled():
+            try:
+                lines: np.ndarray = future.result()
+            except Exception as ex:
+                with self._lock:
+                    interrupted: bool = self._interrupted
+                    self._interrupted = True
+                if not interrupted:
+                    self.failed.emit(str(ex))
+                    self.requestInterruption()
+            else:
+                self.found.emit(self._futures[future], lines)
+                with self._lock:
+                    self._found += 1
+                    found: int = self._found
+                    interrupted = self._interrupted
+                if not interrupted:
+                    self.progress.emit(found, len(self._futures))
+        # counted after the signals of the task are emitted, for `finished` to come after all of them
+        with self._lock:
+            self._over += 1
+            over: int = self._over
+        if over == len(self._futures):
+            self.finished.emit()